@@ -1,45 +1,126 @@
 #auth_middleware.py
 import os
+import time
+import random
+import logging
 import httpx
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.requests import Request
-from starlette.responses import Response, JSONResponse
-from starlette.datastructures import MutableHeaders
+from typing import Optional
+from starlette.requests import HTTPConnection
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from session_cache import session_cache
+from service_client import ServiceClient
 
 USER_SERVICE_URL = os.getenv("USER_SERVICE_URL")
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        
-        public_paths = ["/api/auth/login", "/api/auth/register"]
-        
-        if request.method in ("GET", "OPTIONS") or request.url.path in public_paths:
-            return await call_next(request)
+# 인증 없이 통과시키는 경로 (prefix 매칭). AUTH_PUBLIC_PATHS=/a,/b 로 교체할 수 있습니다.
+DEFAULT_PUBLIC_PATHS = ("/api/auth/login", "/api/auth/register")
+PUBLIC_METHODS = ("GET", "HEAD", "OPTIONS")
+# 요청 로그 샘플링 비율 (0.0 ~ 1.0)
+AUTH_LOG_SAMPLE_RATE = float(os.getenv("AUTH_LOG_SAMPLE_RATE", "0.01"))
 
-        session_id = request.cookies.get("session_id")
-        print(f"Request received: {request.method} {request.url.path}")
+logger = logging.getLogger("gateway.auth")
+
+
+def load_public_paths():
+    configured = os.getenv("AUTH_PUBLIC_PATHS")
+    if not configured:
+        return DEFAULT_PUBLIC_PATHS
+    return tuple(path.strip() for path in configured.split(",") if path.strip())
+
+
+def has_user_id(scope: Scope) -> bool:
+    return any(k == b"x-user-id" for k, _ in scope["headers"])
+
+
+def with_user_id(scope: Scope, user_id: Optional[str]) -> Scope:
+    """X-User-Id 헤더를 모두 제거하고, user_id가 있으면 검증된 값 하나만 넣은 scope 사본"""
+    headers = [(k, v) for k, v in scope["headers"] if k != b"x-user-id"]
+    if user_id is not None:
+        headers.append((b"x-user-id", user_id.encode("latin-1")))
+    scope = dict(scope)
+    scope["headers"] = headers
+    return scope
+
+
+class AuthMiddleware:
+    """
+    세션 쿠키를 검증하고 X-User-Id 헤더를 scope["headers"]에 직접 주입하는 순수 ASGI 미들웨어.
+    BaseHTTPMiddleware와 달리 요청마다 별도 태스크/메모리 스트림을 만들지 않습니다.
+    """
+
+    def __init__(self, app: ASGIApp, public_paths=None, public_methods=PUBLIC_METHODS,
+                 log_sample_rate: float = AUTH_LOG_SAMPLE_RATE):
+        self.app = app
+        paths = [p.rstrip("/") or "/" for p in (public_paths if public_paths is not None else load_public_paths())]
+        # "/api/auth/login" 은 그 자체와 "/api/auth/login/..." 하위 경로에 매칭됩니다.
+        self.public_exact = frozenset(paths)
+        self.public_prefixes = tuple(p if p.endswith("/") else f"{p}/" for p in paths)
+        self.public_methods = frozenset(public_methods)
+        self.log_sample_rate = log_sample_rate
+
+    def is_public(self, method: str, path: str) -> bool:
+        return method in self.public_methods or path in self.public_exact or path.startswith(self.public_prefixes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.is_public(scope["method"], scope["path"]):
+            # 공개 요청에도 클라이언트가 보낸 X-User-Id는 업스트림에 전달하지 않습니다.
+            await self.app(scope if not has_user_id(scope) else with_user_id(scope, None), receive, send)
+            return
+
+        started = time.perf_counter()
+        session_id = HTTPConnection(scope).cookies.get("session_id")
         if not session_id:
-            return JSONResponse(status_code=401, content={"detail": "Not authenticated"})
-        try:
-            async with httpx.AsyncClient() as client:
-                auth_url = f"{USER_SERVICE_URL}/api/auth/me"
-                auth_resp = await client.get(auth_url, cookies={"session_id": session_id})
-
-                if auth_resp.status_code != 200:
-                    return JSONResponse(status_code=auth_resp.status_code, content=auth_resp.json())
-                
-                user_data = auth_resp.json()
-                user_id = str(user_data.get("id"))
-
-                new_headers = request.headers.mutablecopy()
-                
-                new_headers["X-User-Id"] = user_id
-                request.scope["headers"] = new_headers.raw
-                print("--- Modified Headers (new_headers) ---")
-                print(new_headers)
-                print("--------------------------------------")
-        except httpx.RequestError:
-            return JSONResponse(status_code=503, content={"detail": "User service is unavailable"})
-
-        response = await call_next(request)
-        return response
\ No newline at end of file
+            await self._reject(scope, receive, send, 401, {"detail": "Not authenticated"}, started)
+            return
+
+        # 캐시에 검증된 세션이 있으면 user_service 왕복 없이 바로 통과
+        user_id = session_cache.get(session_id)
+        outcome = "cache_hit"
+        if user_id is None:
+            outcome = "verified"
+            try:
+                # 게이트웨이의 user_service 커넥션 풀을 재사용하는 ServiceClient.
+                # 인증 결과는 오래된 값을 쓰면 안 되므로 stale-while-revalidate는 끕니다. (swr=False)
+                user_service: ServiceClient = scope["app"].state.user_service
+                auth_resp = await user_service.get(
+                    f"{USER_SERVICE_URL}/api/auth/me",
+                    headers={"Cookie": f"session_id={session_id}"},
+                    swr=False,
+                )
+            except httpx.RequestError:
+                await self._reject(scope, receive, send, 503, {"detail": "User service is unavailable"}, started)
+                return
+
+            if auth_resp.status_code != 200:
+                try:
+                    content = auth_resp.json()
+                except ValueError:
+                    content = {"detail": "Not authenticated"}
+                await self._reject(scope, receive, send, auth_resp.status_code, content, started)
+                return
+
+            user_id = str(auth_resp.json().get("id"))
+            session_cache.set(session_id, user_id)
+
+        # 클라이언트가 보낸 X-User-Id는 버리고 검증된 값으로 교체
+        scope = with_user_id(scope, user_id)
+
+        self._log(scope, outcome, 200, started, user_id=user_id)
+        await self.app(scope, receive, send)
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send, status_code: int, content, started: float):
+        self._log(scope, "rejected", status_code, started)
+        await JSONResponse(status_code=status_code, content=content)(scope, receive, send)
+
+    def _log(self, scope: Scope, outcome: str, status_code: int, started: float, user_id=None):
+        if self.log_sample_rate <= 0 or random.random() >= self.log_sample_rate:
+            return
+        logger.info(
+            "auth method=%s path=%s outcome=%s status=%s user_id=%s elapsed_ms=%.2f",
+            scope["method"], scope["path"], outcome, status_code, user_id,
+            (time.perf_counter() - started) * 1000,
+        )
@@ -1,8 +1,20 @@
 import os
+import asyncio
+import logging
 import httpx
+import redis.asyncio as redis
 from fastapi import FastAPI, Request, Response, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
 from auth_middleware import AuthMiddleware
+from session_cache import session_cache, listen_for_invalidations
+from service_client import ServiceClient
+from rate_limit import RateLimit, RateLimitMiddleware, check_rate_limit, register_rate_limit_script, too_many_requests
+import response_cache
+from response_cache import CacheRule
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s %(message)s")
 
 app = FastAPI(title="API Gateway")
 
@@ -24,46 +36,209 @@ app.add_middleware(AuthMiddleware)
 USER_SERVICE_URL = os.getenv("USER_SERVICE_URL")
 BLOG_SERVICE_URL = os.getenv("BLOG_SERVICE_URL")
 BOARD_SERVICE_URL = os.getenv("BOARD_SERVICE_URL")
+REDIS_URL = os.getenv("REDIS_URL")
+
+# --- 라우팅 테이블 ---
+UPSTREAMS = {
+    "user": USER_SERVICE_URL,
+    "blog": BLOG_SERVICE_URL,
+    "board": BOARD_SERVICE_URL,
+}
+# --- 요청 수 제한 규칙 ("횟수/초", IP별 / 세션별) ---
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+DEFAULT_LIMIT = RateLimit("default", ip="600/60", session="300/60", lease=10)
+# 로그인/가입/비밀번호 변경은 요청마다 bcrypt를 실행하므로 엄격하게 제한합니다.
+LOGIN_LIMIT = RateLimit("login", ip="10/60", methods=("POST",))
+REGISTER_LIMIT = RateLimit("register", ip="5/600", methods=("POST",))
+PASSWORD_LIMIT = RateLimit("password", ip="10/60", session="5/60", methods=("POST",))
+# 게시판 쓰기도 비밀번호 해시를 계산합니다.
+BOARD_WRITE_LIMIT = RateLimit("board_write", ip="30/60", session="20/60", methods=WRITE_METHODS)
+
+# 경로 prefix -> (업스트림 이름, 제한 규칙) (위에서부터 순서대로 매칭)
+ROUTES = [
+    ("/api/auth/login", "user", (LOGIN_LIMIT,)),
+    ("/api/auth/register", "user", (REGISTER_LIMIT,)),
+    ("/api/auth/change-password", "user", (PASSWORD_LIMIT,)),
+    ("/api/users", "user", (DEFAULT_LIMIT,)),
+    ("/api/auth", "user", (DEFAULT_LIMIT,)),
+    ("/api/blog", "blog", (DEFAULT_LIMIT,)),
+    ("/api/board", "board", (BOARD_WRITE_LIMIT, DEFAULT_LIMIT)),
+]
+
+# 공개 GET 응답 캐시: 경로(정규식) -> 의존하는 캐시 버전, TTL(초)
+# 게이트웨이는 GET 요청에 사용자 정보를 붙이지 않으므로 응답은 사용자와 무관합니다.
+CACHE_RULES = [
+    CacheRule(r"/api/board/posts/", ("board",), ttl=10),
+    # 게시글 목록에는 작성자 이름/프로필 이미지가 포함됩니다.
+    CacheRule(r"/api/blog/articles", ("blog", "users"), ttl=10),
+    CacheRule(r"/api/blog/tags(/counts)?", ("blog",), ttl=30),
+    CacheRule(r"/api/blog/popular-articles", ("blog",), ttl=30),
+    CacheRule(r"/api/users/\d+", ("users",), ttl=30),
+]
+
+# RFC 7230 6.1: 프록시가 그대로 전달하면 안 되는 hop-by-hop 헤더
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "trailers", "transfer-encoding", "upgrade",
+})
+
+def upstream_limits(name: str) -> httpx.Limits:
+    """업스트림별 커넥션 풀 한도. 예) BOARD_MAX_CONNECTIONS=200"""
+    prefix = name.upper()
+    return httpx.Limits(
+        max_connections=int(os.getenv(f"{prefix}_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv(f"{prefix}_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        keepalive_expiry=float(os.getenv(f"{prefix}_KEEPALIVE_EXPIRY", "30")),
+    )
+
+def strip_hop_by_hop(headers) -> list[tuple[str, str]]:
+    """hop-by-hop 헤더와 Connection 헤더에 나열된 헤더를 제거합니다."""
+    connection_tokens = {
+        token.strip().lower() for token in headers.get("connection", "").split(",") if token.strip()
+    }
+    items = headers.multi_items() if isinstance(headers, httpx.Headers) else headers.items()
+    return [
+        (key, value) for key, value in items
+        if key.lower() not in HOP_BY_HOP_HEADERS and key.lower() not in connection_tokens
+    ]
+
+def resolve_upstream(path: str):
+    """경로에 맞는 (업스트림 이름, 제한 규칙). 없으면 (None, ())"""
+    for prefix, name, limits in ROUTES:
+        if path.startswith(prefix):
+            return name, limits
+    return None, ()
+
+# 마지막에 추가한 미들웨어가 가장 바깥에서 실행됩니다: IP 제한 -> 인증 -> CORS -> 라우트
+app.add_middleware(RateLimitMiddleware, resolve_limits=lambda path: resolve_upstream(path)[1])
 
 @app.on_event("startup")
 async def startup_event():
     timeout = httpx.Timeout(10.0, connect=5.0)
-    app.state.client = httpx.AsyncClient(timeout=timeout)
+    # 업스트림마다 독립된 keep-alive 커넥션 풀을 둡니다.
+    app.state.clients = {
+        name: httpx.AsyncClient(timeout=timeout, limits=upstream_limits(name))
+        for name in UPSTREAMS
+    }
+    # auth 미들웨어도 user_service 풀을 그대로 재사용합니다.
+    app.state.client = app.state.clients["user"]
+    # 세션 검증 호출: 같은 세션의 동시 요청은 한 번만 보내고, user_service 장애 시 바로 503
+    app.state.user_service = ServiceClient("user_service", app.state.client)
+
+    # 세션 캐시 무효화 메시지 구독과 요청 수 제한 (REDIS_URL이 없으면 TTL 만료에만 의존, 제한 없음)
+    app.state.redis = None
+    app.state.rate_limit_script = None
+    app.state.invalidation_task = None
+    if REDIS_URL:
+        app.state.redis = redis.from_url(REDIS_URL, decode_responses=True)
+        # 요청마다 Script 객체를 만들지 않도록 한 번만 등록
+        app.state.rate_limit_script = register_rate_limit_script(app.state.redis)
+        app.state.invalidation_task = asyncio.create_task(
+            listen_for_invalidations(app.state.redis, session_cache)
+        )
+    else:
+        print("REDIS_URL 미설정: 세션 캐시 무효화 구독을 건너뜁니다.")
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    await app.state.client.aclose()
+    if app.state.invalidation_task:
+        app.state.invalidation_task.cancel()
+        try:
+            await app.state.invalidation_task
+        except asyncio.CancelledError:
+            pass
+    if app.state.redis:
+        await app.state.redis.aclose()
+    for client in app.state.clients.values():
+        await client.aclose()
 
-@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
+@app.api_route("/{path:path}", methods=["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
 async def reverse_proxy(request : Request):
     path = request.url.path
-    client: httpx.AsyncClient = request.app.state.client
-    
-    if path.startswith("/api/users") or path.startswith("/api/auth"):
-        base_url = USER_SERVICE_URL
-    elif path.startswith("/api/blog"):
-        base_url = BLOG_SERVICE_URL
-    elif path.startswith("/api/board"):
-        base_url = BOARD_SERVICE_URL
-    else:
+
+    upstream, limits = resolve_upstream(path)
+    if upstream is None:
         raise HTTPException(status_code=404, detail="Endpoint not found")
-    
-    url = f"{base_url}{path}?{request.url.query}"
-    
+    # IP 버킷은 RateLimitMiddleware가 인증 전에 검사했으므로 여기서는 인증된 세션 버킷만
+    retry_after = await check_rate_limit(request.app.state.rate_limit_script, request, request.method, limits, "session")
+    if retry_after:
+        return too_many_requests(retry_after)
+    base_url = UPSTREAMS[upstream]
+    client: httpx.AsyncClient = request.app.state.clients[upstream]
+
+    url = f"{base_url}{path}"
+    if request.url.query:
+        url = f"{url}?{request.url.query}"
+
+    # Host는 httpx가 업스트림 주소로 다시 채웁니다.
+    headers = [(k, v) for k, v in strip_hop_by_hop(request.headers) if k.lower() != "host"]
+    # 본문이 있는 요청만 스트리밍으로 그대로 흘려보냅니다. (메모리에 모으지 않음)
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+
+    cache_rule = response_cache.match_cache_rule(CACHE_RULES, request) if request.app.state.redis else None
+    if cache_rule:
+        return await proxy_with_cache(request, client, url, headers, cache_rule)
+
+    upstream_request = client.build_request(
+        method=request.method,
+        url=url,
+        headers=headers,
+        content=request.stream() if has_body else None,
+    )
     try:
-        rp_resp = await client.request(
-            method=request.method,
-            url=url,
-            headers=request.headers,
-            content=await request.body(),
-            cookies=request.cookies
-        )
-        return Response(
-            content=rp_resp.content,
-            status_code=rp_resp.status_code,
-            headers=rp_resp.headers
+        rp_resp = await client.send(upstream_request, stream=True)
+    except httpx.ConnectError:
+        raise HTTPException(status_code=503, detail="Service unavailable")
+    except httpx.ReadTimeout:
+        raise HTTPException(status_code=504, detail=f"Request timeout : {base_url}")
+
+    # 응답 본문은 인코딩된 바이트 그대로 전달하므로 Content-Encoding/Length도 유지됩니다.
+    response = StreamingResponse(
+        rp_resp.aiter_raw(),
+        status_code=rp_resp.status_code,
+        background=BackgroundTask(rp_resp.aclose),
+    )
+    response.raw_headers = [
+        (k.encode("latin-1"), v.encode("latin-1")) for k, v in strip_hop_by_hop(rp_resp.headers)
+    ]
+    return response
+
+async def proxy_with_cache(request: Request, client: httpx.AsyncClient, url: str, headers, rule: CacheRule):
+    """
+    Redis에 저장된 응답이 있으면 업스트림을 호출하지 않고, 없으면 받아서 저장합니다.
+    HEAD 요청도 업스트림에는 GET으로 보내 같은 항목을 채우고, 응답에서 본문만 뺍니다.
+    """
+    redis_client = request.app.state.redis
+    key = response_cache.response_cache_key(request.url.path, request.url.query)
+    entry, versions = await response_cache.lookup(redis_client, rule, key)
+    if entry:
+        return response_cache.cached_response(
+            request, entry["body"].encode("utf-8"), entry["media_type"], entry["etag"], "HIT"
         )
+
+    # 조건부 헤더는 게이트웨이가 처리하므로 업스트림에는 보내지 않습니다.
+    headers = [(k, v) for k, v in headers if k.lower() not in ("if-none-match", "if-modified-since")]
+    try:
+        rp_resp = await client.get(url, headers=headers)
     except httpx.ConnectError:
         raise HTTPException(status_code=503, detail="Service unavailable")
     except httpx.ReadTimeout:
-        raise HTTPException(status_code=504, detail=f"Request timeout : {base_url}")
\ No newline at end of file
+        raise HTTPException(status_code=504, detail=f"Request timeout : {url}")
+
+    if not response_cache.is_cacheable(rp_resp.status_code, rp_resp.headers):
+        response = Response(
+            content=b"" if request.method == "HEAD" else rp_resp.content, status_code=rp_resp.status_code
+        )
+        response.raw_headers = [
+            (k.encode("latin-1"), v.encode("latin-1")) for k, v in strip_hop_by_hop(rp_resp.headers)
+            # httpx가 이미 압축을 푼 본문이므로 길이/인코딩 헤더는 다시 계산
+            if k.lower() not in ("content-length", "content-encoding")
+        ]
+        response.headers["content-length"] = str(len(rp_resp.content))
+        return response
+
+    body = rp_resp.content
+    media_type = rp_resp.headers["content-type"]
+    etag = response_cache.make_etag(body)
+    await response_cache.store(redis_client, rule, key, versions, body, media_type, etag)
+    return response_cache.cached_response(request, body, media_type, etag, "MISS")
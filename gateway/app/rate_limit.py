@@ -0,0 +1,300 @@
+#rate_limit.py
+import os
+import math
+import time
+import socket
+import asyncio
+import hashlib
+import logging
+import ipaddress
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional, Sequence
+
+from starlette.requests import HTTPConnection
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# X-Real-IP를 믿어도 되는 직전 프록시(IP, CIDR 또는 호스트명, 쉼표 구분). 예) "nginx"
+# 비어 있으면 헤더를 무시하고 TCP 연결 주소를 씁니다. (게이트웨이에 직접 붙은 클라이언트가 IP를 위조하지 못하도록)
+RATE_LIMIT_TRUSTED_PROXIES = os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "")
+# 호스트명으로 지정한 프록시의 주소를 다시 조회하는 주기(초). 컨테이너 재시작으로 IP가 바뀔 수 있습니다.
+TRUSTED_PROXY_RESOLVE_SECONDS = float(os.getenv("TRUSTED_PROXY_RESOLVE_SECONDS", "30"))
+RATE_LIMIT_KEY_PREFIX = "ratelimit:"
+# 로컬 임대 토큰의 유효 시간(초). 이 시간 안에 쓰지 못한 토큰은 버립니다.
+RATE_LIMIT_LEASE_SECONDS = float(os.getenv("RATE_LIMIT_LEASE_SECONDS", "1"))
+RATE_LIMIT_LOCAL_MAX_SIZE = int(os.getenv("RATE_LIMIT_LOCAL_MAX_SIZE", "10000"))
+
+logger = logging.getLogger("gateway.rate_limit")
+
+# 토큰 버킷. 여러 버킷(IP/세션, 규칙별)을 한 번에 검사하고, 모두 여유가 있을 때만 함께 차감합니다.
+# 여유가 충분하면 최대 ARGV[1]개를 한꺼번에 가져가 게이트웨이가 로컬에서 나눠 씁니다.
+# KEYS = 버킷 키들, ARGV = [임대 크기, 용량1, 초당 충전량1, 용량2, 초당 충전량2, ...]
+# 반환값: {가져간 토큰 수, 다시 시도할 때까지 남은 시간(ms)}
+TOKEN_BUCKET_LUA = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local lease = tonumber(ARGV[1])
+local tokens = {}
+local granted = lease
+for i, key in ipairs(KEYS) do
+  local capacity = tonumber(ARGV[i * 2])
+  local rate = tonumber(ARGV[i * 2 + 1])
+  local state = redis.call('HMGET', key, 'tokens', 'ts')
+  local current = tonumber(state[1]) or capacity
+  local ts = tonumber(state[2]) or now
+  current = math.min(capacity, current + math.max(0, now - ts) * rate / 1000)
+  tokens[i] = current
+  granted = math.min(granted, math.floor(current))
+end
+
+local retry_ms = 0
+if granted < 1 then
+  granted = 0
+  for i = 1, #KEYS do
+    if tokens[i] < 1 then
+      local rate = tonumber(ARGV[i * 2 + 1])
+      retry_ms = math.max(retry_ms, math.ceil((1 - tokens[i]) * 1000 / rate))
+    end
+  end
+end
+
+for i, key in ipairs(KEYS) do
+  local capacity = tonumber(ARGV[i * 2])
+  local rate = tonumber(ARGV[i * 2 + 1])
+  redis.call('HSET', key, 'tokens', tostring(tokens[i] - granted), 'ts', now)
+  -- 가득 찰 때까지 걸리는 시간이 지나면 키가 없는 것(가득 찬 버킷)과 같으므로 만료시킵니다.
+  redis.call('PEXPIRE', key, math.ceil(capacity * 1000 / rate) + 1000)
+end
+return {granted, retry_ms}
+"""
+
+
+def parse_rate(value: Optional[str]):
+    """"10/60" -> (10, 60.0) : 60초에 10회. 빈 값이면 None (제한 없음)"""
+    if not value:
+        return None
+    count, _, seconds = value.partition("/")
+    return int(count), float(seconds or 1)
+
+
+class RateLimit:
+    """
+    경로 prefix에 붙이는 제한 규칙.
+    ip / session 은 "횟수/초" 형식이며, RATE_LIMIT_<NAME>_IP, RATE_LIMIT_<NAME>_SESSION 환경 변수로 바꿀 수 있습니다.
+    lease는 Redis에서 한 번에 가져와 로컬에서 쓰는 토큰 수입니다. (엄격한 규칙은 1)
+    """
+
+    def __init__(self, name: str, ip: Optional[str] = None, session: Optional[str] = None,
+                 methods: Optional[Iterable[str]] = None, lease: int = 1):
+        prefix = f"RATE_LIMIT_{name.upper()}"
+        self.name = name
+        self.ip = parse_rate(os.getenv(f"{prefix}_IP", ip))
+        self.session = parse_rate(os.getenv(f"{prefix}_SESSION", session))
+        self.methods = frozenset(methods) if methods else None
+        self.lease = max(1, lease)
+
+    def applies_to(self, method: str) -> bool:
+        return self.methods is None or method in self.methods
+
+
+class LocalLeases:
+    """
+    Redis에서 미리 가져온 토큰과 최근 거절 결과를 보관하는 프로세스 내 LRU.
+    한도에 한참 못 미치는 클라이언트와 이미 거절된 클라이언트는 Redis 왕복 없이 처리합니다.
+    """
+
+    def __init__(self, max_size: int = RATE_LIMIT_LOCAL_MAX_SIZE):
+        self.max_size = max_size
+        # key -> (남은 토큰 수, 만료 시각). 토큰 수 0은 만료 시각까지 거절
+        self._entries: "OrderedDict[tuple, tuple[int, float]]" = OrderedDict()
+
+    def take(self, key: tuple) -> Optional[float]:
+        """
+        로컬에서 판단할 수 있으면 결과를 반환합니다.
+        0.0 = 허용, 양수 = 거절(Retry-After 초), None = Redis에 물어봐야 함
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        tokens, expires_at = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+        if tokens == 0:
+            return expires_at - now
+        if tokens == 1:
+            del self._entries[key]
+        else:
+            self._entries[key] = (tokens - 1, expires_at)
+        return 0.0
+
+    def put(self, key: tuple, tokens: int, ttl: float):
+        if self.max_size <= 0 or ttl <= 0:
+            return
+        self._entries[key] = (tokens, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+local_leases = LocalLeases()
+
+
+class TrustedProxies:
+    """X-Real-IP를 넣어 주는 프록시(nginx) 주소 목록. 호스트명은 주기적으로 다시 조회합니다."""
+
+    def __init__(self, entries: str = RATE_LIMIT_TRUSTED_PROXIES, resolve_interval: float = TRUSTED_PROXY_RESOLVE_SECONDS):
+        self.networks = []
+        self.hostnames = []
+        for entry in (e.strip() for e in entries.split(",")):
+            if not entry:
+                continue
+            try:
+                self.networks.append(ipaddress.ip_network(entry, strict=False))
+            except ValueError:
+                self.hostnames.append(entry)
+        self.resolve_interval = resolve_interval
+        self._resolved: frozenset = frozenset()
+        self._resolved_at = float("-inf")
+
+    async def _resolve(self):
+        loop = asyncio.get_running_loop()
+        addresses = set()
+        for hostname in self.hostnames:
+            try:
+                for info in await loop.getaddrinfo(hostname, None, type=socket.SOCK_STREAM):
+                    addresses.add(info[4][0])
+            except OSError as e:
+                # 프록시가 아직 뜨지 않았으면 다음 주기에 다시 조회
+                logger.warning("trusted proxy %s could not be resolved: %s", hostname, e)
+        self._resolved = frozenset(addresses)
+        self._resolved_at = time.monotonic()
+
+    async def contains(self, host: Optional[str]) -> bool:
+        if not host:
+            return False
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        if any(address in network for network in self.networks):
+            return True
+        if not self.hostnames:
+            return False
+        if time.monotonic() - self._resolved_at >= self.resolve_interval:
+            await self._resolve()
+        return host in self._resolved
+
+
+trusted_proxies = TrustedProxies()
+
+
+async def client_ip(conn: HTTPConnection, proxies: TrustedProxies = trusted_proxies) -> str:
+    """직전 연결이 신뢰하는 프록시일 때만 X-Real-IP를 쓰고, 아니면 연결 주소를 씁니다."""
+    peer = conn.client.host if conn.client else None
+    if await proxies.contains(peer):
+        real_ip = conn.headers.get("x-real-ip")
+        if real_ip:
+            return real_ip.strip()
+    return peer or "unknown"
+
+
+async def bucket_keys(conn: HTTPConnection, rules: Sequence[RateLimit], dimension: str):
+    """요청에 적용할 (Redis 키, 용량, 초당 충전량) 목록. dimension: "ip" 또는 "session" """
+    buckets = []
+    if dimension == "ip":
+        ip = await client_ip(conn)
+        for rule in rules:
+            if rule.ip:
+                buckets.append((f"{RATE_LIMIT_KEY_PREFIX}{rule.name}:ip:{ip}", *rule.ip))
+    else:
+        session_id = conn.cookies.get("session_id")
+        if not session_id:
+            return buckets
+        # 세션 ID 원문을 키 이름에 남기지 않습니다.
+        session_hash = hashlib.sha256(session_id.encode()).hexdigest()[:32]
+        for rule in rules:
+            if rule.session:
+                buckets.append((f"{RATE_LIMIT_KEY_PREFIX}{rule.name}:session:{session_hash}", *rule.session))
+    return buckets
+
+
+def register_rate_limit_script(redis_client):
+    """토큰 버킷 스크립트를 한 번 등록해 둡니다. (앱 시작 시 app.state.rate_limit_script)"""
+    return redis_client.register_script(TOKEN_BUCKET_LUA)
+
+
+async def check_rate_limit(script, conn: HTTPConnection, method: str, rules: Sequence[RateLimit],
+                           dimension: str, leases: LocalLeases = local_leases) -> float:
+    """
+    script는 register_rate_limit_script의 결과입니다. (None이면 제한 없음)
+    허용이면 0.0, 제한에 걸리면 다시 시도할 때까지의 초를 반환합니다.
+    IP 버킷은 인증 전에(RateLimitMiddleware), 세션 버킷은 인증 후에(reverse_proxy) 검사합니다.
+    Redis를 쓸 수 없으면 요청을 막지 않습니다. (fail-open)
+    """
+    rules = [rule for rule in rules if rule.applies_to(method)]
+    buckets = await bucket_keys(conn, rules, dimension)
+    if not buckets or script is None:
+        return 0.0
+
+    local_key = tuple(key for key, _, _ in buckets)
+    local_result = leases.take(local_key)
+    if local_result is not None:
+        return local_result
+
+    lease = min(rule.lease for rule in rules)
+    args = [lease]
+    for _, count, seconds in buckets:
+        args += [count, count / seconds]
+    try:
+        granted, retry_ms = await script(keys=list(local_key), args=args)
+    except Exception as e:
+        logger.warning("rate limit check failed, allowing request: %s", e)
+        return 0.0
+
+    granted = int(granted)
+    if granted == 0:
+        retry_after = int(retry_ms) / 1000
+        # 다시 시도할 수 있을 때까지는 같은 클라이언트를 로컬에서 바로 거절
+        leases.put(local_key, 0, retry_after)
+        return retry_after
+    if granted > 1:
+        leases.put(local_key, granted - 1, RATE_LIMIT_LEASE_SECONDS)
+    return 0.0
+
+
+def too_many_requests(retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "요청이 너무 많습니다. 잠시 후 다시 시도해 주세요."},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class RateLimitMiddleware:
+    """
+    인증 미들웨어보다 바깥에서 IP 버킷을 검사하는 순수 ASGI 미들웨어.
+    잘못된 세션 쿠키를 붙인 요청 폭주도 user_service 세션 검증 호출 전에 거절됩니다.
+    resolve_limits(path)는 경로에 붙은 RateLimit 목록을 반환합니다. (main.ROUTES)
+    """
+
+    def __init__(self, app: ASGIApp, resolve_limits: Callable[[str], Sequence[RateLimit]]):
+        self.app = app
+        self.resolve_limits = resolve_limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limits = self.resolve_limits(scope["path"])
+        script = getattr(scope["app"].state, "rate_limit_script", None)
+        if limits and script is not None:
+            retry_after = await check_rate_limit(script, HTTPConnection(scope), scope["method"], limits, "ip")
+            if retry_after:
+                await too_many_requests(retry_after)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
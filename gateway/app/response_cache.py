@@ -0,0 +1,130 @@
+#response_cache.py
+import os
+import re
+import json
+import hashlib
+import logging
+from typing import Optional, Sequence
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+# 각 서비스가 쓰기 후 INCR 하는 버전 키 (services/*/app/cache_version.py와 같은 prefix)
+CACHE_VERSION_PREFIX = "cache:version:"
+RESPONSE_CACHE_KEY_PREFIX = "gateway:response:"
+# 1이면 공개 GET(HEAD) 응답 캐시를 사용합니다.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+# 이보다 큰 응답은 저장하지 않습니다.
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(256 * 1024)))
+# 브라우저는 매번 ETag로 재검증합니다. (변경이 없으면 304, 본문 없음)
+RESPONSE_CACHE_CONTROL = "no-cache"
+
+logger = logging.getLogger("gateway.response_cache")
+
+
+class CacheRule:
+    """
+    캐시할 GET/HEAD 경로(정규식 전체 매칭)와, 응답 내용이 의존하는 버전 이름들.
+    버전 중 하나라도 바뀌면 저장된 응답은 버려지고, 그렇지 않아도 ttl(초)이 지나면 만료됩니다.
+    """
+
+    def __init__(self, pattern: str, versions: Sequence[str], ttl: int):
+        self.pattern = re.compile(pattern)
+        self.versions = tuple(versions)
+        self.ttl = ttl
+
+    def matches(self, path: str) -> bool:
+        return self.pattern.fullmatch(path) is not None
+
+
+def match_cache_rule(rules: Sequence[CacheRule], request: Request) -> Optional[CacheRule]:
+    if not RESPONSE_CACHE_ENABLED or request.method not in ("GET", "HEAD"):
+        return None
+    for rule in rules:
+        if rule.matches(request.url.path):
+            return rule
+    return None
+
+
+def normalize_query(query: str) -> str:
+    """"b=2&a=1&a=0" 과 "a=0&a=1&b=2" 가 같은 키가 되도록 정렬합니다."""
+    return urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+
+
+def response_cache_key(path: str, query: str) -> str:
+    digest = hashlib.sha256(f"{path}?{normalize_query(query)}".encode()).hexdigest()
+    return f"{RESPONSE_CACHE_KEY_PREFIX}{digest}"
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+async def lookup(redis_client, rule: CacheRule, key: str):
+    """
+    버전 키들과 저장된 응답을 MGET 한 번으로 읽습니다.
+    반환값: (유효한 캐시 항목 또는 None, 현재 버전 목록). Redis 오류 시 (None, None)
+    """
+    try:
+        values = await redis_client.mget([f"{CACHE_VERSION_PREFIX}{name}" for name in rule.versions] + [key])
+    except Exception as e:
+        logger.warning("response cache lookup failed: %s", e)
+        return None, None
+    versions = [value or "0" for value in values[:-1]]
+    if values[-1] is None:
+        return None, versions
+    try:
+        entry = json.loads(values[-1])
+        # 저장 이후 관련 데이터가 바뀌었으면 버림
+        if entry.get("versions") != versions:
+            return None, versions
+    except (ValueError, AttributeError) as e:
+        # 깨진 항목은 캐시 미스로 처리하고, 업스트림 응답으로 덮어씁니다.
+        logger.warning("response cache entry %s is corrupt: %s", key, e)
+        return None, versions
+    return entry, versions
+
+
+async def store(redis_client, rule: CacheRule, key: str, versions, body: bytes, media_type: str, etag: str):
+    if versions is None or len(body) > RESPONSE_CACHE_MAX_BYTES:
+        return
+    entry = {
+        "versions": versions,
+        "media_type": media_type,
+        "etag": etag,
+        "body": body.decode("utf-8"),
+    }
+    try:
+        await redis_client.set(key, json.dumps(entry, ensure_ascii=False), ex=rule.ttl)
+    except Exception as e:
+        logger.warning("response cache store failed: %s", e)
+
+
+def is_cacheable(status_code: int, headers) -> bool:
+    """본문을 그대로 저장할 수 있는 응답인지 (성공한 비압축 JSON만)"""
+    return (
+        status_code == 200
+        and "content-encoding" not in headers
+        and "set-cookie" not in headers
+        and headers.get("content-type", "").startswith("application/json")
+    )
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+def cached_response(request: Request, body: bytes, media_type: str, etag: str, cache_status: str) -> Response:
+    """If-None-Match가 일치하면 304, 아니면 200 본문(HEAD면 헤더만). X-Cache에 HIT/MISS를 표시합니다."""
+    headers = {"ETag": etag, "Cache-Control": RESPONSE_CACHE_CONTROL, "X-Cache": cache_status}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if request.method == "HEAD":
+        headers["Content-Length"] = str(len(body))
+        return Response(media_type=media_type, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,98 @@
+#session_cache.py
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+# 세션 TTL(user_service의 SESSION_TTL_SECONDS=3600)보다 훨씬 짧게 유지해야 합니다.
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "60"))
+SESSION_CACHE_MAX_SIZE = int(os.getenv("SESSION_CACHE_MAX_SIZE", "10000"))
+# user_service가 로그아웃/비밀번호 변경 시 "session:<id>" 또는 "user:<id>" 메시지를 발행합니다.
+SESSION_INVALIDATION_CHANNEL = os.getenv("SESSION_INVALIDATION_CHANNEL", "auth:invalidate")
+
+logger = logging.getLogger("gateway.session_cache")
+
+
+class SessionCache:
+    """session_id -> user_id 매핑을 짧은 TTL 동안 보관하는 프로세스 내 LRU 캐시"""
+
+    def __init__(self, max_size: int = SESSION_CACHE_MAX_SIZE, ttl: float = SESSION_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[str, float]]" = OrderedDict()
+
+    def get(self, session_id: str) -> Optional[str]:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        user_id, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[session_id]
+            return None
+        self._entries.move_to_end(session_id)
+        return user_id
+
+    def set(self, session_id: str, user_id: str):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        self._entries[session_id] = (user_id, time.monotonic() + self.ttl)
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate_session(self, session_id: str):
+        self._entries.pop(session_id, None)
+
+    def invalidate_user(self, user_id: str):
+        # 캐시 크기가 제한되어 있으므로 전체 순회로 충분합니다.
+        stale = [sid for sid, (uid, _) in self._entries.items() if uid == user_id]
+        for sid in stale:
+            del self._entries[sid]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+session_cache = SessionCache()
+
+
+def apply_invalidation(cache: SessionCache, message: str):
+    """'session:<id>' / 'user:<id>' 형식의 무효화 메시지를 캐시에 반영합니다."""
+    kind, _, value = message.partition(":")
+    if kind == "session" and value:
+        cache.invalidate_session(value)
+    elif kind == "user" and value:
+        cache.invalidate_user(value)
+    else:
+        # 알 수 없는 메시지는 안전하게 전체 무효화
+        cache.clear()
+
+
+async def listen_for_invalidations(redis_client, cache: SessionCache = session_cache):
+    """Redis pub/sub 채널을 구독하며 세션 캐시를 무효화합니다. (백그라운드 태스크)"""
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(SESSION_INVALIDATION_CHANNEL)
+            # 구독이 끊겨 있던 동안의 메시지는 놓쳤을 수 있으므로 캐시를 비웁니다.
+            cache.clear()
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                apply_invalidation(cache, message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("session invalidation listener error: %s", e)
+            cache.clear()
+            await asyncio.sleep(1)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
@@ -0,0 +1,155 @@
+"""
+게이트웨이 인증 미들웨어 비교 (user-003)
+
+  legacy : 이전 BaseHTTPMiddleware 구현 (9b0554d 이전 gateway/app/auth_middleware.py를 그대로 옮김)
+  asgi   : 현재 순수 ASGI AuthMiddleware
+
+두 미들웨어를 같은 스텁 엔드포인트(X-User-Id를 그대로 돌려주는 POST) 앞에 두고,
+httpx.ASGITransport로 프로세스 안에서 요청을 보내 처리량과 지연을 잽니다.
+세션은 미리 session_cache에 넣어 두어 user_service 호출 없이 미들웨어 자체 비용만 비교합니다.
+(--miss 를 주면 캐시를 비우고 스텁 user_service(MockTransport)로 검증하는 경로를 잽니다.)
+
+  python scripts/bench_auth_middleware.py --requests 5000 --concurrency 50
+"""
+import os
+import io
+import sys
+import time
+import asyncio
+import argparse
+import contextlib
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "gateway", "app"))
+os.environ.setdefault("USER_SERVICE_URL", "http://user_service")
+
+import httpx  # noqa: E402
+from starlette.applications import Starlette  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from starlette.responses import JSONResponse, Response  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+from auth_middleware import AuthMiddleware, USER_SERVICE_URL  # noqa: E402
+from session_cache import session_cache  # noqa: E402
+from service_client import ServiceClient  # noqa: E402
+
+SESSION_ID = "bench-session"
+USER_ID = "42"
+
+
+class LegacyAuthMiddleware(BaseHTTPMiddleware):
+    """이전 구현 (요청마다 출력하던 print도 그대로 둡니다. 측정 중 stdout은 버립니다.)"""
+
+    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+        public_paths = ["/api/auth/login", "/api/auth/register"]
+
+        if request.method in ("GET", "OPTIONS") or request.url.path in public_paths:
+            return await call_next(request)
+
+        session_id = request.cookies.get("session_id")
+        print(f"Request received: {request.method} {request.url.path}")
+        if not session_id:
+            return JSONResponse(status_code=401, content={"detail": "Not authenticated"})
+
+        cached_user_id = session_cache.get(session_id)
+        if cached_user_id is not None:
+            new_headers = request.headers.mutablecopy()
+            new_headers["X-User-Id"] = cached_user_id
+            request.scope["headers"] = new_headers.raw
+            return await call_next(request)
+
+        try:
+            client: httpx.AsyncClient = request.app.state.client
+            auth_url = f"{USER_SERVICE_URL}/api/auth/me"
+            auth_resp = await client.get(auth_url, headers={"Cookie": f"session_id={session_id}"})
+
+            if auth_resp.status_code != 200:
+                return JSONResponse(status_code=auth_resp.status_code, content=auth_resp.json())
+
+            user_data = auth_resp.json()
+            user_id = str(user_data.get("id"))
+            session_cache.set(session_id, user_id)
+
+            new_headers = request.headers.mutablecopy()
+            new_headers["X-User-Id"] = user_id
+            request.scope["headers"] = new_headers.raw
+            print("--- Modified Headers (new_headers) ---")
+            print(new_headers)
+            print("--------------------------------------")
+        except httpx.RequestError:
+            return JSONResponse(status_code=503, content={"detail": "User service is unavailable"})
+
+        response = await call_next(request)
+        return response
+
+
+async def upstream_stub(request: Request):
+    """프록시 대상 대신 X-User-Id만 돌려주는 엔드포인트"""
+    await request.body()
+    return JSONResponse({"user_id": request.headers.get("x-user-id")})
+
+
+def user_service_stub(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"id": int(USER_ID), "username": "bench"})
+
+
+def build_app(middleware) -> Starlette:
+    app = Starlette(routes=[Route("/api/board/posts/", upstream_stub, methods=["POST"])])
+    app.add_middleware(middleware)
+    client = httpx.AsyncClient(transport=httpx.MockTransport(user_service_stub))
+    app.state.client = client
+    app.state.user_service = ServiceClient("user_service", client)
+    return app
+
+
+async def run(name: str, middleware, total: int, concurrency: int, miss: bool) -> dict:
+    app = build_app(middleware)
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway",
+                                 cookies={"session_id": SESSION_ID}) as client:
+        async def one():
+            async with semaphore:
+                if miss:
+                    session_cache.clear()
+                started = time.perf_counter()
+                resp = await client.post("/api/board/posts/", json={"title": "t"})
+                latencies.append(time.perf_counter() - started)
+                assert resp.status_code == 200 and resp.json()["user_id"] == USER_ID, resp.text
+
+        session_cache.clear()
+        session_cache.set(SESSION_ID, USER_ID)
+        await asyncio.gather(*(one() for _ in range(min(200, total))))  # 워밍업
+        latencies.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    return {
+        "middleware": name,
+        "requests": total,
+        "req_per_s": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies_ms), 3),
+        "p99_ms": round(latencies_ms[int(len(latencies_ms) * 0.99) - 1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--miss", action="store_true", help="세션 캐시 없이 매 요청 user_service 스텁으로 검증")
+    args = parser.parse_args()
+
+    for name, middleware in (("legacy", LegacyAuthMiddleware), ("asgi", AuthMiddleware)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = asyncio.run(run(name, middleware, args.requests, args.concurrency, args.miss))
+        print(" ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+bcrypt 해싱이 이벤트 루프를 얼마나 막는지 비교합니다. (user-011)
+
+  inline   : 이전 방식처럼 코루틴 안에서 pwd_context.hash/verify를 직접 호출
+  executor : password_hasher(제한된 스레드 풀)를 통해 호출
+
+동시에 10ms 간격으로 깨어나는 샘플러 태스크를 돌리며, 예정 시각보다 늦게 깨어난 만큼(loop.time() 기준)을
+이벤트 루프 지연으로 기록합니다. 서비스 스택 없이 passlib[bcrypt]만 있으면 실행됩니다.
+
+  python scripts/bench_password_hasher.py --ops 32 --concurrency 8
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "user_service", "app"))
+
+from password_hasher import PasswordHasher, pwd_context  # noqa: E402
+
+SAMPLE_INTERVAL = 0.01
+
+
+async def sample_loop_lag(stop: asyncio.Event, lags: list):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + SAMPLE_INTERVAL
+        await asyncio.sleep(SAMPLE_INTERVAL)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def inline_op(password: str, hashed: str):
+    pwd_context.hash(password)
+    pwd_context.verify(password, hashed)
+
+
+async def executor_op(hasher: PasswordHasher, password: str, hashed: str):
+    await hasher.hash(password)
+    await hasher.verify(password, hashed)
+
+
+async def run(mode: str, ops: int, concurrency: int, workers: int) -> dict:
+    password = "correct horse battery staple"
+    hashed = pwd_context.hash(password)
+    hasher = PasswordHasher(workers=workers, max_pending=ops * 2)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            if mode == "inline":
+                await inline_op(password, hashed)
+            else:
+                await executor_op(hasher, password, hashed)
+
+    stop = asyncio.Event()
+    lags: list = []
+    sampler = asyncio.create_task(sample_loop_lag(stop, lags))
+    await asyncio.sleep(SAMPLE_INTERVAL * 2)  # 샘플러가 먼저 돌기 시작하도록
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(ops)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler
+    hasher.shutdown()
+
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    return {
+        "mode": mode,
+        "elapsed_s": round(elapsed, 3),
+        "ops_per_s": round(ops / elapsed, 1),
+        "lag_samples": len(lags_ms),
+        "lag_avg_ms": round(statistics.fmean(lags_ms), 2),
+        "lag_p99_ms": round(lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))], 2),
+        "lag_max_ms": round(lags_ms[-1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=32, help="hash+verify 쌍의 수")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    for mode in ("inline", "executor"):
+        result = asyncio.run(run(mode, args.ops, args.concurrency, args.workers))
+        print(" ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
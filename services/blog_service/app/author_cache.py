@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+import redis.asyncio as redis
+
+# user_service의 user_cache.py와 같은 키/채널을 사용합니다.
+USER_CACHE_KEY_PREFIX = "user:public:"
+USER_UPDATED_CHANNEL = "user:updated"
+
+# Redis(서비스 간 공유) / 프로세스 내 LRU 캐시 유효 시간
+AUTHOR_CACHE_TTL_SECONDS = int(os.getenv("AUTHOR_CACHE_TTL_SECONDS", "60"))
+AUTHOR_LOCAL_TTL_SECONDS = float(os.getenv("AUTHOR_LOCAL_TTL_SECONDS", "10"))
+AUTHOR_LOCAL_MAX_SIZE = int(os.getenv("AUTHOR_LOCAL_MAX_SIZE", "5000"))
+
+
+def user_cache_key(user_id) -> str:
+    return f"{USER_CACHE_KEY_PREFIX}{user_id}"
+
+
+class AuthorCache:
+    """
+    작성자(사용자 공개 정보) 캐시.
+    프로세스 내 LRU -> Redis(MGET) -> user_service 일괄 조회 순서로 찾고, 찾은 값은 상위 캐시에 채웁니다.
+    """
+
+    def __init__(self, local_ttl: float = AUTHOR_LOCAL_TTL_SECONDS, max_size: int = AUTHOR_LOCAL_MAX_SIZE,
+                 redis_ttl: int = AUTHOR_CACHE_TTL_SECONDS):
+        self.local_ttl = local_ttl
+        self.max_size = max_size
+        self.redis_ttl = redis_ttl
+        self._local: "OrderedDict[int, tuple[dict, float]]" = OrderedDict()
+
+    def _get_local(self, user_id: int) -> Optional[dict]:
+        entry = self._local.get(user_id)
+        if entry is None:
+            return None
+        data, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._local[user_id]
+            return None
+        self._local.move_to_end(user_id)
+        return data
+
+    def _set_local(self, user_id: int, data: dict):
+        self._local[user_id] = (data, time.monotonic() + self.local_ttl)
+        self._local.move_to_end(user_id)
+        while len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        self._local.pop(user_id, None)
+
+    def clear(self):
+        self._local.clear()
+
+    async def get_many(
+        self,
+        redis_client: Optional[redis.Redis],
+        user_ids: Iterable[int],
+        fetch: Callable[[List[int]], Awaitable[List[dict]]],
+    ) -> Dict[int, dict]:
+        """user_id -> 사용자 정보. user_service에도 없는 사용자는 결과에서 빠집니다."""
+        found: Dict[int, dict] = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            data = self._get_local(user_id)
+            if data is not None:
+                found[user_id] = data
+            else:
+                missing.append(user_id)
+
+        if missing and redis_client:
+            values = await redis_client.mget([user_cache_key(user_id) for user_id in missing])
+            still_missing = []
+            for user_id, value in zip(missing, values):
+                if value is None:
+                    still_missing.append(user_id)
+                    continue
+                data = json.loads(value)
+                found[user_id] = data
+                self._set_local(user_id, data)
+            missing = still_missing
+
+        if missing:
+            fetched = await fetch(missing)
+            for data in fetched:
+                found[data["id"]] = data
+                self._set_local(data["id"], data)
+            if fetched and redis_client:
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    for data in fetched:
+                        pipe.set(user_cache_key(data["id"]), json.dumps(data), ex=self.redis_ttl)
+                    await pipe.execute()
+
+        return found
+
+
+author_cache = AuthorCache()
+
+
+async def listen_for_user_updates(redis_client: redis.Redis, cache: AuthorCache = author_cache,
+                                  on_update: Optional[Callable[[], None]] = None):
+    """
+    user_service의 사용자 변경 알림을 구독해 프로세스 내 캐시를 비웁니다. (백그라운드 태스크)
+    on_update는 알림마다 호출되며, 사용자별로 지울 수 없는 다른 캐시를 비우는 데 씁니다.
+    """
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(USER_UPDATED_CHANNEL)
+            # 구독이 끊겨 있던 동안의 알림은 놓쳤을 수 있으므로 비우고 시작합니다.
+            cache.clear()
+            if on_update:
+                on_update()
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                if on_update:
+                    on_update()
+                try:
+                    cache.invalidate(int(message["data"]))
+                except (TypeError, ValueError):
+                    cache.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"사용자 변경 알림 구독 오류: {e}")
+            cache.clear()
+            await asyncio.sleep(1)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
@@ -0,0 +1,23 @@
+from typing import Optional
+
+import redis.asyncio as redis
+
+# 쓰기 작업마다 1씩 증가하는 캐시 버전. 캐시 키에 버전을 넣어 두면 한 번의 INCR로 관련 캐시 전체가 무효화됩니다.
+CACHE_VERSION_PREFIX = "cache:version:"
+
+
+def cache_version_key(name: str) -> str:
+    return f"{CACHE_VERSION_PREFIX}{name}"
+
+
+async def get_cache_version(redis_client: Optional[redis.Redis], name: str) -> int:
+    if not redis_client:
+        return 0
+    value = await redis_client.get(cache_version_key(name))
+    return int(value) if value is not None else 0
+
+
+async def bump_cache_version(redis_client: Optional[redis.Redis], name: str):
+    """게시글 생성/수정/삭제 등 쓰기 작업 후 호출합니다."""
+    if redis_client:
+        await redis_client.incr(cache_version_key(name))
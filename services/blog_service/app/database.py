@@ -1,19 +1,126 @@
 import os
+import time
 from dotenv import load_dotenv
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy import inspect, text, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
 
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL is None:
     raise ValueError("DATABASE_URL 환경 변수가 설정되지 않았습니다.")
-engine = create_async_engine(DATABASE_URL)
+# 설정하면 읽기 전용 엔드포인트(get_read_session)는 복제본(replica)을 사용합니다.
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+
+# --- 커넥션 풀 설정 ---
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# MySQL wait_timeout 이나 중간 프록시에 끊기기 전에 커넥션을 새로 맺습니다. (초)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# 풀이 가득 찼을 때 커넥션을 기다리는 최대 시간 (초)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# 꺼내기 전에 끊긴 커넥션인지 확인 (DB 재시작/페일오버 후 첫 요청 실패 방지)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """커넥션을 꺼낼 때(checkout) 기다린 시간을 집계하는 풀"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_count = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.checkout_timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.checkout_timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkout_count += 1
+            self.checkout_wait_total += waited
+            self.checkout_wait_max = max(self.checkout_wait_max, waited)
+
+    def metrics(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "checkouts": self.checkout_count,
+            "checkout_timeouts": self.checkout_timeouts,
+            "checkout_wait_avg_ms": round(self.checkout_wait_total / self.checkout_count * 1000, 3) if self.checkout_count else 0.0,
+            "checkout_wait_max_ms": round(self.checkout_wait_max * 1000, 3),
+        }
+
+
+def create_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+
+
+engine: AsyncEngine = create_engine(DATABASE_URL)
+read_engine: AsyncEngine = create_engine(DATABASE_READ_URL) if DATABASE_READ_URL else engine
+
+
+def pool_metrics() -> dict:
+    """/metrics 용 풀 상태 (복제본을 쓰지 않으면 primary만)"""
+    metrics = {"primary": engine.sync_engine.pool.metrics()}
+    if read_engine is not engine:
+        metrics["replica"] = read_engine.sync_engine.pool.metrics()
+    return metrics
+
+
+def create_missing_indexes(sync_conn):
+    """
+    create_all은 이미 존재하는 테이블에 새로 정의된 인덱스를 추가하지 않으므로,
+    모델에 선언되어 있지만 DB에 없는 인덱스를 이름 기준으로 찾아 생성합니다.
+    """
+    inspector = inspect(sync_conn)
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(sync_conn)
+
+def add_missing_columns(sync_conn):
+    """
+    create_all은 기존 테이블에 새 컬럼을 추가하지 않으므로, 모델에 새로 생긴 컬럼을
+    ALTER TABLE ... ADD COLUMN 으로 추가합니다. (NULL 허용 컬럼만 지원)
+    """
+    inspector = inspect(sync_conn)
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_ddl = CreateColumn(column).compile(dialect=sync_conn.dialect)
+                sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
 
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.run_sync(add_missing_columns)
+        await conn.run_sync(create_missing_indexes)
 
 async def get_session():
     async with AsyncSession(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+async def get_read_session():
+    """읽기 전용 엔드포인트용 세션 (DATABASE_READ_URL이 없으면 primary와 동일)"""
+    async with AsyncSession(read_engine) as session:
+        yield session
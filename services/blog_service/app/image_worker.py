@@ -0,0 +1,135 @@
+import asyncio
+import os
+import sys
+import json
+import uuid
+import logging
+from dotenv import load_dotenv
+from PIL import Image, ImageOps
+import redis.asyncio as redis
+
+from image_variants import (
+    IMAGE_VARIANT_QUEUE, IMAGE_VARIANT_WIDTHS, IMAGE_VARIANT_FORMATS, VARIANT_DIRNAME,
+    is_image_filename, variant_path,
+)
+
+# --- 로깅 설정 ---
+logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='--- [ImageWorker] %(message)s')
+
+load_dotenv()
+REDIS_URL = os.getenv("REDIS_URL")
+
+# 작업의 kind -> 원본 이미지 디렉터리 (docker-compose에서 두 업로드 폴더를 모두 마운트)
+IMAGE_DIRS = {
+    "images": os.getenv("BLOG_IMAGE_DIR", "/app/static/images"),
+    "profiles": os.getenv("PROFILE_IMAGE_DIR", "/app/static/profiles"),
+}
+WEBP_QUALITY = int(os.getenv("WEBP_QUALITY", "80"))
+JPEG_QUALITY = int(os.getenv("JPEG_QUALITY", "85"))
+
+
+def save_variant(image: Image.Image, path: str, fmt: str):
+    """임시 파일에 저장한 뒤 rename 하여, 반쯤 쓰인 파일이 '준비됨'으로 보이지 않게 합니다."""
+    temp_path = f"{path}.{uuid.uuid4().hex}.part"
+    try:
+        if fmt == "jpeg":
+            image.convert("RGB").save(temp_path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+        else:
+            image.save(temp_path, "WEBP", quality=WEBP_QUALITY, method=4)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def generate_variants(directory: str, filename: str) -> int:
+    """없는 크기/형식만 만듭니다. 반환값: 새로 만든 파일 수 (CPU 작업이므로 스레드에서 실행)"""
+    missing = [
+        (width, fmt) for width in IMAGE_VARIANT_WIDTHS for fmt in IMAGE_VARIANT_FORMATS
+        if not os.path.exists(variant_path(directory, filename, width, fmt))
+    ]
+    if not missing:
+        return 0
+
+    source_path = os.path.join(directory, filename)
+    os.makedirs(os.path.join(directory, VARIANT_DIRNAME), exist_ok=True)
+    with Image.open(source_path) as source:
+        source = ImageOps.exif_transpose(source)  # 휴대폰 사진의 회전 정보 반영
+        if source.mode not in ("RGB", "RGBA"):
+            source = source.convert("RGBA" if "transparency" in source.info else "RGB")
+        for width, fmt in missing:
+            resized = source
+            if source.width > width:  # 원본보다 크게 늘리지는 않음
+                height = max(1, round(source.height * width / source.width))
+                resized = source.resize((width, height), Image.LANCZOS)
+            save_variant(resized, variant_path(directory, filename, width, fmt), fmt)
+    return len(missing)
+
+
+async def process_job(raw_job: str):
+    try:
+        job = json.loads(raw_job)
+        directory = IMAGE_DIRS[job["kind"]]
+        filename = os.path.basename(job["filename"])
+    except (ValueError, KeyError, TypeError):
+        logging.warning(f"잘못된 작업을 건너뜁니다: {raw_job!r}")
+        return
+
+    if not os.path.exists(os.path.join(directory, filename)):
+        return  # 처리 전에 원본이 삭제된 경우
+    try:
+        created = await asyncio.to_thread(generate_variants, directory, filename)
+        if created:
+            logging.info(f"{job['kind']}/{filename}: 리사이즈 파일 {created}개 생성")
+    except Exception as e:
+        # 이미지가 아니거나 손상된 파일: API는 계속 원본을 사용합니다.
+        logging.error(f"{job['kind']}/{filename} 리사이즈 실패: {e}")
+
+
+async def enqueue_missing(redis_client: redis.Redis):
+    """
+    시작 시 리사이즈 파일이 없는 기존 원본을 찾아 큐에 넣습니다.
+    (기능 도입 이전 업로드분이나, 워커가 내려가 있는 동안 잃어버린 작업 보충)
+    """
+    total = 0
+    for kind, directory in IMAGE_DIRS.items():
+        if not os.path.isdir(directory):
+            continue
+        jobs = [
+            json.dumps({"kind": kind, "filename": entry.name})
+            for entry in os.scandir(directory)
+            if entry.is_file() and is_image_filename(entry.name)
+            and not all(
+                os.path.exists(variant_path(directory, entry.name, width, fmt))
+                for width in IMAGE_VARIANT_WIDTHS for fmt in IMAGE_VARIANT_FORMATS
+            )
+        ]
+        if jobs:
+            await redis_client.lpush(IMAGE_VARIANT_QUEUE, *jobs)
+            total += len(jobs)
+    if total:
+        logging.info(f"리사이즈 파일이 없는 기존 이미지 {total}개를 큐에 넣었습니다.")
+
+
+async def main():
+    redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+    await enqueue_missing(redis_client)
+    logging.info(f"이미지 워커 시작. 큐 '{IMAGE_VARIANT_QUEUE}' 대기 중... (Ctrl+C로 종료)")
+    try:
+        while True:
+            try:
+                item = await redis_client.brpop(IMAGE_VARIANT_QUEUE, timeout=5)
+            except redis.ConnectionError as e:
+                logging.error(f"Redis 연결 오류: {e}")
+                await asyncio.sleep(1)
+                continue
+            if item:
+                await process_job(item[1])
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        await redis_client.aclose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
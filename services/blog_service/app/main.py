@@ -1,17 +1,36 @@
 import os
 import math
 import asyncio
-import uuid
 import httpx
+from datetime import datetime
 
-from typing import Annotated, List, Set, Optional
+from typing import Annotated, List, Optional
 from fastapi import FastAPI, Depends, HTTPException, Header, Query, status, UploadFile, File
 from fastapi.staticfiles import StaticFiles
 from sqlmodel import select, func, SQLModel # func를 임포트
 from sqlmodel.ext.asyncio.session import AsyncSession
-
-from models import BlogArticle, ArticleCreate, ArticleUpdate, ArticleImage
-from database import init_db, get_session
+from sqlalchemy import or_, and_, update
+from sqlalchemy.dialects.mysql import match
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from models import BlogArticle, ArticleCreate, ArticleUpdate, ArticleImage, ArticleTag
+from database import init_db, get_session, get_read_session, engine, read_engine, pool_metrics
+from pagination import encode_cursor, decode_cursor
+from redis_client import redis_client
+from author_cache import author_cache, listen_for_user_updates
+from service_client import ServiceClient
+from cache_version import get_cache_version, bump_cache_version
+from search import parse_terms, to_boolean_query, highlight, search_cache_key, get_cached_search, set_cached_search, SNIPPET_LENGTH
+from popularity import (
+    record_article_view, refresh_popular_articles, try_acquire_refresh_lock,
+    get_cached_popular_articles, forget_popular_article, POPULAR_TOP_N, POPULAR_REFRESH_SECONDS,
+)
+from image_variants import enqueue_variants, image_url, remove_variants
+from uploads import save_uploads, discard_uploads, finalize_uploads, remove_unreferenced
+from tag_index import (
+    parse_tags, normalize_tag, replace_article_tags, adjust_tag_counts, get_tag_counts,
+    backfill_article_tags, ensure_tag_collation, normalize_existing_tags,
+)
 
 app = FastAPI(title="Blog Service")
 USER_SERVICE_URL = os.getenv("USER_SERVICE_URL", "http://user_service:8001") # 기본값 추가 (Docker 환경 고려)
@@ -31,11 +50,150 @@ class PaginatedResponse(SQLModel):
     size: int
     pages: int
     items: List[dict] = []
-
+    next_cursor: Optional[str] = None
+
+class ArticleSearchItem(SQLModel):
+    id: int
+    title: str
+    owner_id: int
+    create_at: datetime
+    tags: Optional[str] = None
+    score: float
+    title_highlight: str
+    snippet: str
+
+class ArticleSearchResponse(SQLModel):
+    query: str
+    items: List[ArticleSearchItem] = []
+    next_cursor: Optional[str] = None
+
+class TagCount(SQLModel):
+    tag: str
+    count: int
+
+
+# 목록 썸네일로 쓰는 리사이즈 폭(px)
+THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", "320"))
+
+# 블로그 글 변경 시 올리는 캐시 버전 이름 (검색 결과 캐시 등이 이 버전을 키에 포함)
+BLOG_CACHE_VERSION = "blog"
+
+# user_service 호출용 공유 커넥션 풀 / 사용자 변경 알림 구독 태스크
+http_client: Optional[httpx.AsyncClient] = None
+# singleflight / stale-while-revalidate / 회로 차단 / hedged retry를 적용한 user_service 호출
+user_service: Optional[ServiceClient] = None
+user_updates_task: Optional[asyncio.Task] = None
+# 인기 게시글 상위 N개를 주기적으로 미리 계산하는 스케줄러
+scheduler: Optional[AsyncIOScheduler] = None
+
+async def refresh_popular_job():
+    """인기 게시글 목록 재계산 (여러 인스턴스 중 잠금을 얻은 한 곳에서만 실행)"""
+    try:
+        if not await try_acquire_refresh_lock(redis_client):
+            return
+        async with AsyncSession(read_engine) as session:
+            await refresh_popular_articles(redis_client, session)
+    except Exception as e:
+        print(f"인기 게시글 재계산 실패: {e}")
 
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    # 기존 게시글의 tags 문자열을 ArticleTag 테이블로 옮김 (이미 옮긴 게시글은 건너뜀)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(ensure_tag_collation)
+        async with AsyncSession(engine) as session:
+            normalized = await normalize_existing_tags(session, redis_client)
+            if normalized:
+                print(f"태그 정규화 완료: 태그 {normalized}종")
+            migrated = await backfill_article_tags(session, redis_client)
+        if migrated:
+            print(f"태그 인덱스 백필 완료: 게시글 {migrated}개")
+    except Exception as e:
+        print(f"태그 인덱스 백필 실패 (다음 시작 시 다시 시도): {e}")
+    # 썸네일 포인터가 없는 기존 게시글에 첫 번째 이미지를 채움
+    try:
+        async with AsyncSession(engine) as session:
+            await backfill_thumbnails(session)
+    except Exception as e:
+        print(f"썸네일 백필 실패 (다음 시작 시 다시 시도): {e}")
+
+    global http_client, user_service, user_updates_task
+    http_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(5.0, connect=2.0),
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+    )
+    user_service = ServiceClient("user_service", http_client)
+    user_updates_task = asyncio.create_task(
+        listen_for_user_updates(redis_client, author_cache, on_update=user_service.clear)
+    )
+
+    global scheduler
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(refresh_popular_job, 'interval', seconds=POPULAR_REFRESH_SECONDS,
+                      id="popular_articles_job", coalesce=True, max_instances=1)
+    scheduler.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if scheduler:
+        scheduler.shutdown(wait=False)
+    if user_updates_task:
+        user_updates_task.cancel()
+        try:
+            await user_updates_task
+        except asyncio.CancelledError:
+            pass
+    if http_client:
+        await http_client.aclose()
+
+# --- 내부 지표 (게이트웨이를 거치지 않는 내부용) ---
+@app.get("/metrics")
+async def get_metrics():
+    return {"db_pool": pool_metrics(), "user_service": user_service.stats() if user_service else None}
+
+async def fetch_users(user_ids: List[int]) -> List[dict]:
+    """user_service의 일괄 조회 API로 여러 사용자를 한 번에 가져옵니다."""
+    # ID를 정렬해 같은 작성자 묶음이면 같은 요청(= singleflight/SWR 키)이 되도록 합니다.
+    resp = await user_service.get(f"{USER_SERVICE_URL}/api/users", params={"ids": ",".join(map(str, sorted(user_ids)))})
+    resp.raise_for_status()
+    return resp.json()
+
+async def get_authors(user_ids) -> dict:
+    """작성자 정보 조회 (프로세스 내 LRU -> Redis -> user_service 일괄 조회)"""
+    return await author_cache.get_many(redis_client, user_ids, fetch_users)
+
+async def count_image_references(session: AsyncSession, image_filename: str) -> int:
+    """같은 저장 파일을 가리키는 게시글 이미지 행 수"""
+    result = await session.exec(select(func.count(ArticleImage.id)).where(ArticleImage.image_filename == image_filename))
+    count = result.one()
+    # 다음 호출이 최신 커밋을 보도록 읽기 트랜잭션을 끝냅니다. (REPEATABLE READ 스냅샷 재사용 방지)
+    await session.rollback()
+    return count
+
+async def backfill_thumbnails(session: AsyncSession):
+    """thumbnail_filename이 비어 있고 이미지가 있는 게시글에 가장 먼저 올린 이미지를 지정합니다."""
+    first_image = (
+        select(ArticleImage.image_filename)
+        .where(ArticleImage.article_id == BlogArticle.id)
+        .order_by(ArticleImage.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    has_images = select(ArticleImage.id).where(ArticleImage.article_id == BlogArticle.id).exists()
+    await session.execute(
+        update(BlogArticle)
+        .where(BlogArticle.thumbnail_filename == None, has_images)
+        .values(thumbnail_filename=first_image)
+    )
+    await session.commit()
+
+def thumbnail_url(filename: Optional[str]) -> Optional[str]:
+    """목록용 썸네일 URL (리사이즈 파일이 아직 없으면 원본)"""
+    if not filename:
+        return None
+    return image_url("/static/images", IMAGE_DIR, filename, THUMBNAIL_WIDTH)
 
 # --- 게시글 생성 엔드포인트 ---
 @app.post("/api/blog/articles", response_model=BlogArticle, status_code=status.HTTP_201_CREATED)
@@ -47,8 +205,12 @@ async def create_article(
     """새로운 블로그 게시글을 생성합니다."""
     new_article = BlogArticle.model_validate(article_data, update={"owner_id": x_user_id})
     session.add(new_article)
+    await session.flush()  # 태그 행에 쓸 id 확보 (같은 트랜잭션에서 커밋)
+    added, _ = await replace_article_tags(session, new_article.id, [], parse_tags(new_article.tags))
     await session.commit()
     await session.refresh(new_article)
+    await adjust_tag_counts(redis_client, added=added)
+    await bump_cache_version(redis_client, BLOG_CACHE_VERSION)
     return new_article
 
 # --- 게시글 이미지 업로드 엔드포인트 ---
@@ -66,22 +228,31 @@ async def upload_article_images(
     if db_article.owner_id != x_user_id:
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    saved_filenames = []
-    for file in files:
-        file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(IMAGE_DIR, unique_filename)
-
-        # 파일 저장
-        with open(file_path, "wb") as buffer:
-            buffer.write(await file.read())
+    # 청크 단위로 저장 (크기 제한 초과 시 413, 이미 저장한 파일은 정리)
+    uploads = await save_uploads(files, IMAGE_DIR)
 
+    saved_filenames = []
+    for upload in uploads:
         # DB에 이미지 정보 저장
-        new_image = ArticleImage(image_filename=unique_filename, article_id=article_id)
+        new_image = ArticleImage(image_filename=upload.filename, article_id=article_id)
         session.add(new_image)
-        saved_filenames.append(unique_filename)
+        saved_filenames.append(upload.filename)
 
-    await session.commit()
+    # 처음 올린 이미지를 목록 썸네일로 지정
+    if uploads and not db_article.thumbnail_filename:
+        db_article.thumbnail_filename = uploads[0].filename
+        session.add(db_article)
+
+    try:
+        await session.commit()
+    except BaseException:
+        await discard_uploads(uploads)
+        raise
+    await finalize_uploads(uploads)
+    # 썸네일 등 리사이즈 파일은 image_worker가 백그라운드에서 생성
+    await enqueue_variants(redis_client, "images", saved_filenames)
+    # 목록의 썸네일이 바뀌었을 수 있음
+    await bump_cache_version(redis_client, BLOG_CACHE_VERSION)
     return saved_filenames
 
 # --- 특정 게시글 조회 엔드포인트 ---
@@ -94,10 +265,7 @@ async def get_article(article_id: int, session: Annotated[AsyncSession, Depends(
 
     author_info = {}
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(f"{USER_SERVICE_URL}/api/users/{article.owner_id}")
-            if resp.status_code == 200:
-                author_info = resp.json()
+        author_info = (await get_authors([article.owner_id])).get(article.owner_id, {})
     except Exception as e:
         print(f"Error fetching author info for owner_id {article.owner_id}: {e}")
         author_info = {"username": "Unknown"}
@@ -108,20 +276,25 @@ async def get_article(article_id: int, session: Annotated[AsyncSession, Depends(
 
     image_urls = [f"/static/images/{filename}" for filename in image_filenames]
 
+    # 인기 게시글 집계용 시간 버킷에 조회 기록 (실패해도 상세 조회는 계속)
+    try:
+        await record_article_view(redis_client, article_id)
+    except Exception as e:
+        print(f"Error recording view for article {article_id}: {e}")
+
     return {"article": article, "author": author_info, "image_urls": image_urls}
 
 # --- 게시글 목록 조회 엔드포인트 ---
 @app.get("/api/blog/articles", response_model=PaginatedResponse)
 async def list_articles(
-    session: Annotated[AsyncSession, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_read_session)],
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
     owner_id: Optional[int] = None,
-    tag: Optional[str] = None
+    tag: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="이전 응답의 next_cursor (지정 시 page 대신 사용)")
 ):
     """블로그 게시글 목록을 페이지네이션하여 반환합니다."""
-    offset = (page - 1) * size
-
     count_query = select(func.count(BlogArticle.id))
     articles_query = select(BlogArticle).order_by(BlogArticle.id.desc())
 
@@ -129,74 +302,123 @@ async def list_articles(
         count_query = count_query.where(BlogArticle.owner_id == owner_id)
         articles_query = articles_query.where(BlogArticle.owner_id == owner_id)
 
-    if tag:
-        count_query = count_query.where(BlogArticle.tags.like(f"%{tag}%"))
-        articles_query = articles_query.where(BlogArticle.tags.like(f"%{tag}%"))
+    if tag and tag.strip():
+        # 태그 인덱스 (tag, article_id) 를 타는 조인. 부분 문자열이 아닌 정확한 태그만 매칭
+        tag_filter = (ArticleTag.article_id == BlogArticle.id) & (ArticleTag.tag == normalize_tag(tag))
+        count_query = count_query.join(ArticleTag, tag_filter)
+        articles_query = articles_query.join(ArticleTag, tag_filter)
 
     total_result = await session.exec(count_query)
     total = total_result.one()
 
-    paginated_query = articles_query.offset(offset).limit(size)
+    if cursor:
+        # keyset 페이지네이션: OFFSET으로 앞쪽 행을 스캔하지 않고 마지막 id 다음부터 읽음
+        (last_id,) = decode_cursor(cursor, 1)
+        if not isinstance(last_id, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        paginated_query = articles_query.where(BlogArticle.id < last_id).limit(size)
+    else:
+        paginated_query = articles_query.offset((page - 1) * size).limit(size)
     articles_result = await session.exec(paginated_query)
     articles = articles_result.all()
+    next_cursor = encode_cursor(articles[-1].id) if len(articles) == size else None
 
     author_ids = {p.owner_id for p in articles}
     authors = {}
     if author_ids:
         try:
-            async with httpx.AsyncClient() as client:
-                tasks = [client.get(f"{USER_SERVICE_URL}/api/users/{uid}") for uid in author_ids]
-                results = await asyncio.gather(*tasks)
-                for resp in results:
-                    if resp.status_code == 200:
-                        data = resp.json()
-                        authors[data['id']] = data.get('username', 'Unknown')
+            authors = {uid: data.get('username', 'Unknown') for uid, data in (await get_authors(author_ids)).items()}
         except Exception as e:
             print(f"Error fetching authors: {e}")
 
-    article_ids = [a.id for a in articles]
-    thumbnails = {}
-    if article_ids:
-        image_query = select(ArticleImage).where(ArticleImage.article_id.in_(article_ids))
-        image_results = await session.exec(image_query)
-        for img in image_results.all():
-            if img.article_id not in thumbnails:
-                thumbnails[img.article_id] = f"/static/images/{img.image_filename}"
-
     items_with_details = []
     for article in articles:
         article_dict = article.model_dump()
         article_dict["author_username"] = authors.get(article.owner_id, "Unknown")
-        article_dict["image_url"] = thumbnails.get(article.id)
+        article_dict["image_url"] = thumbnail_url(article.thumbnail_filename)
         items_with_details.append(article_dict)
 
     return PaginatedResponse(
         total=total, page=page, size=size,
-        pages=math.ceil(total / size), items=items_with_details
+        pages=math.ceil(total / size), items=items_with_details,
+        next_cursor=next_cursor
     )
 
+# --- 게시글 검색 엔드포인트 ---
+@app.get("/api/blog/search", response_model=ArticleSearchResponse)
+async def search_articles(
+    session: Annotated[AsyncSession, Depends(get_read_session)],
+    q: str = Query(..., min_length=1, max_length=100),
+    size: int = Query(10, ge=1, le=50),
+    cursor: Optional[str] = Query(None, description="이전 응답의 next_cursor"),
+):
+    """제목/본문 FULLTEXT 검색. 관련도 순으로 정렬하고 검색어를 <mark>로 강조합니다."""
+    terms = parse_terms(q)
+    if not terms:
+        return ArticleSearchResponse(query=q)
+
+    version = await get_cache_version(redis_client, BLOG_CACHE_VERSION)
+    cache_key = search_cache_key("blog", version, terms, size, cursor)
+    cached = await get_cached_search(redis_client, cache_key)
+    if cached is not None:
+        cached["query"] = q
+        return cached
+
+    score = match(BlogArticle.title, BlogArticle.content, against=to_boolean_query(terms)).in_boolean_mode()
+    query = (
+        select(BlogArticle, score.label("score"))
+        .where(score > 0)
+        .order_by(score.desc(), BlogArticle.id.desc())
+    )
+    if cursor:
+        last_score, last_id = decode_cursor(cursor, 2)
+        if not isinstance(last_score, (int, float)) or not isinstance(last_id, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(or_(score < last_score, and_(score == last_score, BlogArticle.id < last_id)))
+    rows = (await session.exec(query.limit(size))).all()
+
+    items = [
+        ArticleSearchItem(
+            id=article.id,
+            title=article.title,
+            owner_id=article.owner_id,
+            create_at=article.create_at,
+            tags=article.tags,
+            score=float(article_score),
+            title_highlight=highlight(article.title, terms),
+            snippet=highlight(article.content, terms, SNIPPET_LENGTH),
+        )
+        for article, article_score in rows
+    ]
+    next_cursor = encode_cursor(items[-1].score, items[-1].id) if len(items) == size else None
+    result = ArticleSearchResponse(query=q, items=items, next_cursor=next_cursor)
+    await set_cached_search(redis_client, cache_key, result.model_dump())
+    return result
+
 # --- 모든 태그 조회 엔드포인트 ---
 @app.get("/api/blog/tags", response_model=List[str])
-async def get_all_tags(session: Annotated[AsyncSession, Depends(get_session)]):
-    """모든 게시물의 태그를 수집하여 중복없이 반환합니다."""
-    query = select(BlogArticle.tags).where(BlogArticle.tags != None)
-    result = await session.exec(query)
-    all_tags: Set[str] = set()
-
-    for tags_str in result.all():
-        if tags_str is not None:
-            tags = [tag.strip() for tag in tags_str.split(',') if tag.strip()]
-            all_tags.update(tags)
-    return sorted(list(all_tags))
-
-# --- 인기 (최신) 게시글 조회 엔드포인트 ---
+async def get_all_tags(session: Annotated[AsyncSession, Depends(get_read_session)]):
+    """모든 게시물의 태그를 중복없이 반환합니다. (Redis 태그 집계 사용)"""
+    return sorted(tag for tag, _ in await get_tag_counts(redis_client, session))
+
+# --- 태그별 게시글 수 조회 엔드포인트 (태그 클라우드) ---
+@app.get("/api/blog/tags/counts", response_model=List[TagCount])
+async def get_tag_cloud(session: Annotated[AsyncSession, Depends(get_read_session)]):
+    """태그별 게시글 수를 많은 순으로 반환합니다."""
+    return [TagCount(tag=tag, count=count) for tag, count in await get_tag_counts(redis_client, session)]
+
+# --- 인기 게시글 조회 엔드포인트 ---
 @app.get("/api/blog/popular-articles", response_model=List[BlogArticle])
-async def get_popular_articles(session: Annotated[AsyncSession, Depends(get_session)]):
-    """가장 최근에 작성된 블로그 게시글 4개를 반환합니다."""
-    query = select(BlogArticle).order_by(BlogArticle.id.desc()).limit(4)
-    result = await session.exec(query)
-    popular_articles = result.all()
-    return popular_articles
+async def get_popular_articles(limit: int = Query(4, ge=1, le=POPULAR_TOP_N)):
+    """
+    최근 조회수(시간이 지날수록 가중치 감소) 기준 인기 게시글을 반환합니다.
+    스케줄러가 미리 계산해 둔 Redis 목록만 읽고, 목록이 없을 때(최초 기동 등)에만 DB에서 계산합니다.
+    """
+    popular_articles = await get_cached_popular_articles(redis_client)
+    if popular_articles is None:
+        async with AsyncSession(read_engine) as session:
+            popular_articles = await refresh_popular_articles(redis_client, session)
+    return [BlogArticle.model_validate(article) for article in popular_articles[:limit]]
 
 # --- 게시글 업데이트 엔드포인트 ---
 @app.patch("/api/blog/articles/{article_id}", response_model=BlogArticle)
@@ -214,13 +436,20 @@ async def update_article(
         raise HTTPException(status_code=403, detail="Not authorized")
 
     update_data = article_data.model_dump(exclude_unset=True)
+    old_tags = parse_tags(db_article.tags)
 
     for key, value in update_data.items():
         setattr(db_article, key, value)
 
+    added, removed = [], []
+    if "tags" in update_data:
+        added, removed = await replace_article_tags(session, article_id, old_tags, parse_tags(db_article.tags))
+
     session.add(db_article)
     await session.commit()
     await session.refresh(db_article)
+    await adjust_tag_counts(redis_client, added=added, removed=removed)
+    await bump_cache_version(redis_client, BLOG_CACHE_VERSION)
     return db_article
 
 # --- 게시글 삭제 엔드포인트 ---
@@ -240,13 +469,24 @@ async def delete_article(
     # 게시글에 연결된 모든 이미지 조회 및 삭제
     image_query = select(ArticleImage).where(ArticleImage.article_id == article_id)
     images_to_delete = (await session.exec(image_query)).all()
+    image_filenames = [image.image_filename for image in images_to_delete]
     for image in images_to_delete:
-        file_path = os.path.join(IMAGE_DIR, image.image_filename)
-        if os.path.exists(file_path):
-            os.remove(file_path) # 실제 이미지 파일 삭제
         await session.delete(image) # DB에서 이미지 기록 삭제
 
+    # 태그 행 삭제
+    _, removed = await replace_article_tags(session, article_id, parse_tags(db_article.tags), [])
+
     # 게시글 자체 삭제
     await session.delete(db_article)
     await session.commit()
+
+    # 실제 이미지 파일은 다른 게시글이 같은 파일을 참조하지 않을 때만 삭제
+    removed_files = await remove_unreferenced(
+        IMAGE_DIR, image_filenames,
+        lambda name: count_image_references(session, name),
+    )
+    remove_variants(IMAGE_DIR, removed_files)
+    await adjust_tag_counts(redis_client, removed=removed)
+    await bump_cache_version(redis_client, BLOG_CACHE_VERSION)
+    await forget_popular_article(redis_client, article_id)
     return
\ No newline at end of file
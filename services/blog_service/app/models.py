@@ -2,13 +2,21 @@ from datetime import datetime
 from typing import Optional
 from zoneinfo import ZoneInfo
 from sqlmodel import Field, SQLModel
+from sqlalchemy import Index, Column, String
 
 class ArticleImage(SQLModel, table=True):
   id: Optional[int] = Field(default=None, primary_key=True)
-  image_filename: str
+  image_filename: str = Field(index=True)  # "<sha256><확장자>", 같은 내용이면 여러 행이 공유
   article_id: Optional[int]=Field(default=None, index=True)
   
 class BlogArticle(SQLModel, table=True):
+  __table_args__ = (
+    # 작성자별 목록의 keyset 페이지네이션 (owner_id, id DESC) 용 복합 인덱스
+    Index("ix_blogarticle_owner_id_id", "owner_id", "id"),
+    # 제목/본문 검색용 FULLTEXT 인덱스 (ngram 파서, MySQL 전용)
+    Index("ft_blogarticle_title_content", "title", "content", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+  )
+
   id: Optional[int] = Field(default=None, primary_key=True)
   title: str = Field(index=True)
   content: str
@@ -16,6 +24,25 @@ class BlogArticle(SQLModel, table=True):
   #timezone.utc
   owner_id: int
   tags: Optional[str] = Field(default=None)
+  # 목록 썸네일로 쓰는 첫 번째 이미지 파일명 (목록 조회 시 ArticleImage를 다시 읽지 않기 위함)
+  thumbnail_filename: Optional[str] = Field(default=None)
+
+class ArticleTag(SQLModel, table=True):
+  # BlogArticle.tags(쉼표 구분 문자열)를 정규화한 게시글-태그 연결 테이블
+  __table_args__ = (
+    Index("ux_articletag_article_id_tag", "article_id", "tag", unique=True),
+    # 태그별 목록 조회 (tag = ? ORDER BY article_id DESC) 용
+    Index("ix_articletag_tag_article_id", "tag", "article_id"),
+  )
+
+  id: Optional[int] = Field(default=None, primary_key=True)
+  article_id: int
+  # tag_index.normalize_tag로 정규화한 값. 파이썬 쪽 중복 제거/Redis 집계와 비교 규칙이 같도록
+  # MySQL에서는 대소문자·악센트를 구분하는 바이너리 collation을 씁니다.
+  tag: str = Field(sa_column=Column(
+    String(255).with_variant(String(255, collation="utf8mb4_bin"), "mysql"), nullable=False,
+  ))
+
 class ArticleCreate(SQLModel):
     title: str
     content: str
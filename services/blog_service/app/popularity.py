@@ -0,0 +1,103 @@
+import os
+import json
+import time
+from typing import List, Optional
+
+import redis.asyncio as redis
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import BlogArticle
+
+# 시간(hour) 단위 조회수 버킷: blog:views:hour:<epoch_hour> (ZSET, member=article_id, score=조회수)
+VIEW_BUCKET_PREFIX = "blog:views:hour:"
+# 버킷을 감쇠 가중치로 합친 인기 점수 (ZUNIONSTORE 결과)
+POPULAR_SCORES_KEY = "blog:popular:scores"
+# 미리 계산해 둔 상위 N개 게시글 (JSON). 인기 게시글 API는 이 키만 읽습니다.
+POPULAR_TOP_KEY = "blog:popular:top"
+# 여러 인스턴스 중 한 곳에서만 재계산하도록 거는 잠금
+POPULAR_LOCK_KEY = "blog:popular:lock"
+
+POPULAR_WINDOW_HOURS = int(os.getenv("POPULAR_WINDOW_HOURS", "24"))
+# 이 시간(시간 단위)이 지날 때마다 조회수의 가중치가 절반이 됩니다.
+POPULAR_HALF_LIFE_HOURS = float(os.getenv("POPULAR_HALF_LIFE_HOURS", "6"))
+POPULAR_TOP_N = int(os.getenv("POPULAR_TOP_N", "20"))
+POPULAR_REFRESH_SECONDS = int(os.getenv("POPULAR_REFRESH_SECONDS", "60"))
+
+
+def current_hour() -> int:
+    return int(time.time() // 3600)
+
+
+def view_bucket_key(hour: int) -> str:
+    return f"{VIEW_BUCKET_PREFIX}{hour}"
+
+
+async def record_article_view(redis_client: Optional[redis.Redis], article_id: int):
+    """현재 시간 버킷의 조회수를 1 올립니다. (버킷은 집계 구간이 지나면 만료)"""
+    if not redis_client:
+        return
+    key = view_bucket_key(current_hour())
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.zincrby(key, 1, str(article_id))
+        pipe.expire(key, (POPULAR_WINDOW_HOURS + 1) * 3600)
+        await pipe.execute()
+
+
+async def compute_popular_scores(redis_client: redis.Redis, hour: Optional[int] = None) -> int:
+    """최근 POPULAR_WINDOW_HOURS개 버킷을 시간이 지날수록 작아지는 가중치로 합칩니다. 반환값: 게시글 수"""
+    hour = current_hour() if hour is None else hour
+    weights = {
+        view_bucket_key(hour - age): 0.5 ** (age / POPULAR_HALF_LIFE_HOURS)
+        for age in range(POPULAR_WINDOW_HOURS)
+    }
+    # 없는 키는 빈 집합으로 취급되므로 그대로 넘겨도 됩니다.
+    return await redis_client.zunionstore(POPULAR_SCORES_KEY, weights)
+
+
+async def build_popular_articles(redis_client: Optional[redis.Redis], session: AsyncSession, limit: int = POPULAR_TOP_N) -> List[dict]:
+    """인기 점수 상위 게시글을 DB에서 읽어 순서대로 반환합니다. 조회 기록이 부족하면 최신 글로 채웁니다."""
+    ranked_ids = []
+    if redis_client:
+        await compute_popular_scores(redis_client)
+        # 삭제된 글이 섞여 있을 수 있으므로 여유 있게 가져옵니다.
+        ranked_ids = [int(article_id) for article_id in await redis_client.zrevrange(POPULAR_SCORES_KEY, 0, limit * 2 - 1)]
+
+    articles = []
+    if ranked_ids:
+        result = await session.exec(select(BlogArticle).where(BlogArticle.id.in_(ranked_ids)))
+        by_id = {article.id: article for article in result.all()}
+        articles = [by_id[article_id] for article_id in ranked_ids if article_id in by_id][:limit]
+
+    if len(articles) < limit:
+        seen = {article.id for article in articles}
+        latest = await session.exec(select(BlogArticle).order_by(BlogArticle.id.desc()).limit(limit))
+        articles += [article for article in latest.all() if article.id not in seen][:limit - len(articles)]
+
+    return [article.model_dump(mode="json") for article in articles]
+
+
+async def refresh_popular_articles(redis_client: redis.Redis, session: AsyncSession) -> List[dict]:
+    """상위 N개를 다시 계산해 POPULAR_TOP_KEY에 저장합니다. (스케줄러에서 주기적으로 호출)"""
+    articles = await build_popular_articles(redis_client, session)
+    # 잡이 멈추더라도 오래된 목록이 계속 남지 않도록 만료를 둡니다.
+    await redis_client.set(POPULAR_TOP_KEY, json.dumps(articles, ensure_ascii=False), ex=POPULAR_REFRESH_SECONDS * 5)
+    return articles
+
+
+async def try_acquire_refresh_lock(redis_client: redis.Redis) -> bool:
+    return bool(await redis_client.set(POPULAR_LOCK_KEY, "1", nx=True, ex=max(POPULAR_REFRESH_SECONDS - 5, 1)))
+
+
+async def get_cached_popular_articles(redis_client: Optional[redis.Redis]) -> Optional[List[dict]]:
+    if not redis_client:
+        return None
+    cached = await redis_client.get(POPULAR_TOP_KEY)
+    return json.loads(cached) if cached else None
+
+
+async def forget_popular_article(redis_client: Optional[redis.Redis], article_id: int):
+    """삭제된 글이 목록에 남아 있으면 캐시를 버려 다음 요청에서 다시 계산되게 합니다."""
+    cached = await get_cached_popular_articles(redis_client)
+    if cached and any(article["id"] == article_id for article in cached):
+        await redis_client.delete(POPULAR_TOP_KEY)
@@ -0,0 +1,202 @@
+#service_client.py
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+import httpx
+
+# 한 번의 시도에 허용하는 시간(초). 느린 인스턴스 하나가 호출한 쪽 전체를 붙잡지 않도록 짧게 둡니다.
+SERVICE_CALL_TIMEOUT_SECONDS = float(os.getenv("SERVICE_CALL_TIMEOUT_SECONDS", "1.5"))
+# 첫 시도가 이 시간(초) 안에 끝나지 않으면 같은 요청을 하나 더 보내 먼저 온 응답을 씁니다. (hedged request)
+SERVICE_HEDGE_DELAY_SECONDS = float(os.getenv("SERVICE_HEDGE_DELAY_SECONDS", "0.2"))
+SERVICE_MAX_ATTEMPTS = int(os.getenv("SERVICE_MAX_ATTEMPTS", "2"))
+# 연속 실패가 이 횟수에 이르면 회로를 열고, 열린 동안은 호출하지 않고 바로 실패합니다.
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "10"))
+# stale-while-revalidate: fresh 동안은 그대로, stale 구간에서는 옛 응답을 주면서 백그라운드로 갱신
+SWR_FRESH_SECONDS = float(os.getenv("SWR_FRESH_SECONDS", "5"))
+SWR_STALE_SECONDS = float(os.getenv("SWR_STALE_SECONDS", "60"))
+SWR_MAX_SIZE = int(os.getenv("SWR_MAX_SIZE", "1000"))
+
+logger = logging.getLogger("service_client")
+
+
+class CircuitOpenError(httpx.RequestError):
+    """회로가 열려 있어 업스트림을 호출하지 않고 바로 실패한 경우"""
+
+
+class CircuitBreaker:
+    """
+    연속 실패 횟수 기반 회로 차단기.
+    열린 뒤 reset_timeout이 지나면 시험 요청 하나만 통과시키고(half-open), 그 결과로 닫거나 다시 엽니다.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open" or self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def release_probe(self):
+        """시험 요청이 결과 없이 끝난 경우(취소 등) 다음 요청이 시험할 수 있게 합니다."""
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.failures >= self.failure_threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+
+class ServiceClient:
+    """
+    서비스 간 GET 호출 래퍼. (멱등 요청 전용)
+    - singleflight: 같은 요청이 동시에 여러 번 오면 업스트림에는 한 번만 보냅니다.
+    - stale-while-revalidate: swr=True인 호출의 200 응답을 잠시 보관합니다.
+    - 회로 차단기: 업스트림이 계속 실패하면 기다리지 않고 CircuitOpenError(httpx.RequestError)를 냅니다.
+    - hedged retry: 짧은 타임아웃으로 시도하고, 느리거나 실패하면 다음 시도를 보냅니다.
+    """
+
+    def __init__(self, name: str, client: httpx.AsyncClient, timeout: float = SERVICE_CALL_TIMEOUT_SECONDS,
+                 hedge_delay: float = SERVICE_HEDGE_DELAY_SECONDS, max_attempts: int = SERVICE_MAX_ATTEMPTS,
+                 fresh_ttl: float = SWR_FRESH_SECONDS, stale_ttl: float = SWR_STALE_SECONDS,
+                 max_size: int = SWR_MAX_SIZE, breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.client = client
+        self.timeout = timeout
+        self.hedge_delay = hedge_delay
+        self.max_attempts = max(1, max_attempts)
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self.breaker = breaker or CircuitBreaker()
+        self._inflight: "dict[tuple, asyncio.Task]" = {}
+        # key -> (응답, fresh 만료 시각, stale 만료 시각)
+        self._cache: "OrderedDict[tuple, tuple[httpx.Response, float, float]]" = OrderedDict()
+
+    async def get(self, url: str, params: Optional[dict] = None, headers: Optional[dict] = None,
+                  swr: bool = True) -> httpx.Response:
+        key = (url, tuple(sorted((params or {}).items())), tuple(sorted((headers or {}).items())))
+        if swr:
+            entry = self._cache.get(key)
+            if entry is not None:
+                response, fresh_until, stale_until = entry
+                now = time.monotonic()
+                if now < fresh_until:
+                    self._cache.move_to_end(key)
+                    return response
+                if now < stale_until:
+                    # 옛 응답을 바로 주고, 갱신은 백그라운드에서 (이미 진행 중이면 합류)
+                    self._start(key, url, params, headers, swr)
+                    return response
+                del self._cache[key]
+        # 호출한 쪽이 취소되어도 같은 요청을 기다리는 다른 호출자에게는 영향이 없도록 shield
+        return await asyncio.shield(self._start(key, url, params, headers, swr))
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "inflight": len(self._inflight),
+            "cached": len(self._cache),
+        }
+
+    def _start(self, key: tuple, url: str, params, headers, swr: bool) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, url, params, headers, swr))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return task
+
+    def _finish(self, key: tuple, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # 백그라운드 갱신이 실패해도 "exception was never retrieved" 경고가 나지 않도록 결과를 확인합니다.
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug("%s request failed: %s", self.name, task.exception())
+
+    async def _fetch(self, key: tuple, url: str, params, headers, swr: bool) -> httpx.Response:
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            response = await self._hedged_get(url, params, headers)
+        except httpx.HTTPError:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release_probe()
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            return response
+        self.breaker.record_success()
+        if swr and response.status_code == 200:
+            now = time.monotonic()
+            self._cache[key] = (response, now + self.fresh_ttl, now + self.fresh_ttl + self.stale_ttl)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return response
+
+    async def _hedged_get(self, url: str, params, headers) -> httpx.Response:
+        pending: set = set()
+        last_response: Optional[httpx.Response] = None
+        last_error: Optional[BaseException] = None
+        try:
+            for attempt in range(self.max_attempts):
+                pending.add(asyncio.create_task(
+                    self.client.get(url, params=params, headers=headers, timeout=self.timeout)
+                ))
+                is_last = attempt == self.max_attempts - 1
+                while pending:
+                    # 마지막 시도가 아니면 hedge_delay까지만 기다렸다가 다음 시도를 겹쳐 보냅니다.
+                    done, pending = await asyncio.wait(
+                        pending, timeout=None if is_last else self.hedge_delay,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    for task in done:
+                        try:
+                            response = task.result()
+                        except httpx.HTTPError as e:
+                            last_error = e
+                            continue
+                        if response.status_code < 500:
+                            return response
+                        last_response = response
+                    if not is_last:
+                        break  # 느리거나 실패 -> 다음 시도
+            if last_response is not None:
+                return last_response
+            raise last_error or httpx.RequestError(f"{self.name} request failed")
+        finally:
+            for task in pending:
+                task.cancel()
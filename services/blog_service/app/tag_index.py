@@ -0,0 +1,192 @@
+import os
+import unicodedata
+from typing import Iterable, List, Optional, Tuple
+
+import redis.asyncio as redis
+from sqlalchemy import delete, text
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import BlogArticle, ArticleTag
+
+# 태그 -> 게시글 수 (ZSET). 게시글 생성/수정/삭제 시 증감하고, 없으면 DB의 GROUP BY 결과로 다시 채웁니다.
+TAG_COUNTS_KEY = "blog:tags"
+# 증감이 어긋나더라도 최대 이 시간 안에는 DB 값으로 다시 채워집니다.
+TAG_COUNTS_TTL_SECONDS = int(os.getenv("TAG_COUNTS_TTL_SECONDS", "3600"))
+TAG_BACKFILL_BATCH_SIZE = int(os.getenv("TAG_BACKFILL_BATCH_SIZE", "500"))
+# models.ArticleTag.tag 컬럼 길이 / MySQL collation
+MAX_TAG_LENGTH = 255
+TAG_COLLATION = "utf8mb4_bin"
+
+# 키가 있을 때만 증감하고, 0 이하가 된 태그는 제거합니다. ARGV = [tag1, delta1, tag2, delta2, ...]
+ADJUST_TAG_COUNTS_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return false
+end
+for i = 1, #ARGV, 2 do
+  redis.call('ZINCRBY', KEYS[1], ARGV[i + 1], ARGV[i])
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', 0)
+return true
+"""
+
+
+def normalize_tag(tag: str) -> str:
+    """저장/비교/집계에 쓰는 태그 형태: 유니코드 정규화(NFKC) + 앞뒤 공백 제거 + casefold ("Python" -> "python")"""
+    return unicodedata.normalize("NFKC", tag).strip().casefold()[:MAX_TAG_LENGTH]
+
+
+def parse_tags(tags_str: Optional[str]) -> List[str]:
+    """"a, B,,A" -> ["a", "b"] (정규화 후 빈 값/중복 제거, 입력 순서 유지)"""
+    if not tags_str:
+        return []
+    return list(dict.fromkeys(tag for tag in (normalize_tag(part) for part in tags_str.split(",")) if tag))
+
+
+def ensure_tag_collation(sync_conn):
+    """
+    create_all은 기존 컬럼을 바꾸지 않으므로, MySQL의 articletag.tag가 바이너리 collation이 아니면 변경합니다.
+    (기존 대소문자 무시 유니크 인덱스를 통과한 값은 바이너리 비교에서도 유일하므로 안전합니다.)
+    """
+    if sync_conn.dialect.name != "mysql":
+        return
+    collation = sync_conn.execute(text(
+        "SELECT COLLATION_NAME FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'articletag' AND COLUMN_NAME = 'tag'"
+    )).scalar()
+    if collation and collation != TAG_COLLATION:
+        sync_conn.execute(text(
+            f"ALTER TABLE articletag MODIFY tag VARCHAR({MAX_TAG_LENGTH}) "
+            f"CHARACTER SET utf8mb4 COLLATE {TAG_COLLATION} NOT NULL"
+        ))
+
+
+async def normalize_existing_tags(session: AsyncSession, redis_client: Optional[redis.Redis] = None) -> int:
+    """
+    정규화 도입 이전에 저장된 태그 행("Python" 등)을 정규화된 값으로 합칩니다.
+    같은 게시글에 이미 정규화된 태그가 있으면 옛 행만 지웁니다. 반환값: 바뀐 태그 종류 수
+    """
+    changed = 0
+    for tag in (await session.exec(select(ArticleTag.tag).distinct())).all():
+        normalized = normalize_tag(tag)
+        if normalized == tag:
+            continue
+        article_ids = set((await session.exec(select(ArticleTag.article_id).where(ArticleTag.tag == tag))).all())
+        if normalized:
+            already = set((await session.exec(
+                select(ArticleTag.article_id).where(ArticleTag.tag == normalized, ArticleTag.article_id.in_(article_ids))
+            )).all())
+            for article_id in article_ids - already:
+                session.add(ArticleTag(article_id=article_id, tag=normalized))
+        await session.execute(delete(ArticleTag).where(ArticleTag.tag == tag))
+        await session.commit()
+        changed += 1
+
+    if changed and redis_client:
+        await redis_client.delete(TAG_COUNTS_KEY)
+    return changed
+
+
+async def replace_article_tags(
+    session: AsyncSession, article_id: int, old_tags: List[str], new_tags: List[str]
+) -> Tuple[List[str], List[str]]:
+    """
+    게시글의 태그 행을 새 태그 목록에 맞춥니다. 커밋은 호출하는 쪽에서 합니다.
+    반환값: (추가된 태그, 제거된 태그)
+    """
+    old_set, new_set = set(old_tags), set(new_tags)
+    added = [tag for tag in new_tags if tag not in old_set]
+    removed = [tag for tag in old_tags if tag not in new_set]
+    if removed:
+        await session.execute(
+            delete(ArticleTag).where(ArticleTag.article_id == article_id, ArticleTag.tag.in_(removed))
+        )
+    for tag in added:
+        session.add(ArticleTag(article_id=article_id, tag=tag))
+    return added, removed
+
+
+async def adjust_tag_counts(redis_client: Optional[redis.Redis], added: Iterable[str] = (), removed: Iterable[str] = ()):
+    """커밋 이후 호출해 태그별 게시글 수를 증감합니다."""
+    args = []
+    for tag in added:
+        args += [tag, 1]
+    for tag in removed:
+        args += [tag, -1]
+    if redis_client and args:
+        script = redis_client.register_script(ADJUST_TAG_COUNTS_LUA)
+        await script(keys=[TAG_COUNTS_KEY], args=args)
+
+
+async def count_tags_in_db(session: AsyncSession) -> List[Tuple[str, int]]:
+    """SELECT tag, COUNT(*) FROM articletag GROUP BY tag"""
+    result = await session.exec(select(ArticleTag.tag, func.count(ArticleTag.id)).group_by(ArticleTag.tag))
+    return [(tag, count) for tag, count in result.all()]
+
+
+async def get_tag_counts(redis_client: Optional[redis.Redis], session: AsyncSession) -> List[Tuple[str, int]]:
+    """(태그, 게시글 수) 목록을 게시글 수 내림차순으로 반환합니다."""
+    if redis_client:
+        cached = await redis_client.zrange(TAG_COUNTS_KEY, 0, -1, withscores=True)
+        if cached:
+            return sorted(((tag, int(score)) for tag, score in cached), key=lambda item: (-item[1], item[0]))
+
+    counts = await count_tags_in_db(session)
+    if redis_client and counts:
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(TAG_COUNTS_KEY)
+            pipe.zadd(TAG_COUNTS_KEY, {tag: count for tag, count in counts})
+            pipe.expire(TAG_COUNTS_KEY, TAG_COUNTS_TTL_SECONDS)
+            await pipe.execute()
+    return sorted(counts, key=lambda item: (-item[1], item[0]))
+
+
+async def backfill_one_by_one(session: AsyncSession, rows) -> int:
+    migrated = 0
+    for article_id, tags_str in rows:
+        for tag in parse_tags(tags_str):
+            session.add(ArticleTag(article_id=article_id, tag=tag))
+        try:
+            await session.commit()
+            migrated += 1
+        except IntegrityError as e:
+            await session.rollback()
+            print(f"게시글 {article_id}의 태그 백필을 건너뜁니다: {e}")
+    return migrated
+
+
+async def backfill_article_tags(session: AsyncSession, redis_client: Optional[redis.Redis] = None) -> int:
+    """
+    태그 행이 하나도 없는 기존 게시글의 tags 문자열을 ArticleTag로 옮깁니다.
+    이미 옮긴 게시글은 건너뛰므로 여러 번 실행해도 안전합니다. 반환값: 처리한 게시글 수
+    """
+    has_tag_rows = select(ArticleTag.id).where(ArticleTag.article_id == BlogArticle.id).exists()
+    migrated = 0
+    last_id = 0
+    while True:
+        query = (
+            select(BlogArticle.id, BlogArticle.tags)
+            .where(BlogArticle.tags != None, BlogArticle.id > last_id, ~has_tag_rows)
+            .order_by(BlogArticle.id)
+            .limit(TAG_BACKFILL_BATCH_SIZE)
+        )
+        rows = (await session.exec(query)).all()
+        if not rows:
+            break
+        for article_id, tags_str in rows:
+            for tag in parse_tags(tags_str):
+                session.add(ArticleTag(article_id=article_id, tag=tag))
+        try:
+            await session.commit()
+            migrated += len(rows)
+        except IntegrityError:
+            # 배치 안의 게시글 하나 때문에 나머지가 모두 실패하지 않도록 게시글 단위로 다시 시도합니다.
+            await session.rollback()
+            migrated += await backfill_one_by_one(session, rows)
+        last_id = rows[-1][0]
+
+    if migrated and redis_client:
+        # 다음 조회 때 DB 기준으로 다시 집계되도록 합니다.
+        await redis_client.delete(TAG_COUNTS_KEY)
+    return migrated
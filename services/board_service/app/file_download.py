@@ -0,0 +1,108 @@
+import os
+import re
+import json
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Awaitable, Callable, Iterable, Optional
+from urllib.parse import quote
+
+import redis.asyncio as redis
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+# file_id -> 첨부 파일 메타데이터(JSON) 캐시. 다운로드마다 DB 조회/stat 하지 않기 위함
+FILE_META_KEY_PREFIX = "board:file:"
+FILE_META_TTL_SECONDS = int(os.getenv("FILE_META_TTL_SECONDS", "300"))
+# 1이면 파일 전송을 nginx에 맡깁니다. (응답에 X-Accel-Redirect 헤더만 담아 보냄)
+FILE_DOWNLOAD_X_ACCEL = os.getenv("FILE_DOWNLOAD_X_ACCEL", "0") == "1"
+# nginx.conf의 internal location 경로
+X_ACCEL_PREFIX = os.getenv("X_ACCEL_PREFIX", "/internal/board_files/")
+# 저장 파일명이 내용 해시이므로 같은 file_id의 내용은 바뀌지 않습니다.
+DOWNLOAD_CACHE_CONTROL = "private, max-age=86400"
+
+_SHA256_NAME = re.compile(r"^[0-9a-f]{64}$")
+
+
+def file_meta_key(file_id) -> str:
+    return f"{FILE_META_KEY_PREFIX}{file_id}"
+
+
+def build_file_meta(path: str, filepath: str, filename: str, mimetype: str) -> Optional[dict]:
+    """디스크의 파일 정보를 포함한 메타데이터. 파일이 없으면 None"""
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        return None
+    stem = os.path.splitext(filepath)[0]
+    # 내용 주소 파일명이면 해시를 그대로 ETag로, 아니면 (크기, 수정 시각)으로 만듭니다.
+    etag = f'"{stem}"' if _SHA256_NAME.match(stem) else f'"{stat_result.st_size:x}-{int(stat_result.st_mtime):x}"'
+    return {
+        "filepath": filepath,
+        "filename": filename,
+        "mimetype": mimetype,
+        "size": stat_result.st_size,
+        "mtime": int(stat_result.st_mtime),
+        "etag": etag,
+    }
+
+
+async def get_file_meta(redis_client: Optional[redis.Redis], file_id: int,
+                        loader: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+    if redis_client:
+        cached = await redis_client.get(file_meta_key(file_id))
+        if cached:
+            return json.loads(cached)
+    meta = await loader()
+    if meta and redis_client:
+        await redis_client.set(file_meta_key(file_id), json.dumps(meta, ensure_ascii=False), ex=FILE_META_TTL_SECONDS)
+    return meta
+
+
+async def invalidate_file_meta(redis_client: Optional[redis.Redis], file_ids: Iterable[int]):
+    keys = [file_meta_key(file_id) for file_id in file_ids]
+    if redis_client and keys:
+        await redis_client.delete(*keys)
+
+
+def is_not_modified(request: Request, meta: dict) -> bool:
+    """If-None-Match가 있으면 그것만, 없으면 If-Modified-Since로 판단합니다. (RFC 9110 13.2.2)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or meta["etag"] in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return meta["mtime"] <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def file_response(request: Request, meta: dict, path: str) -> Response:
+    """
+    조건부 요청이면 304, X-Accel 모드면 nginx에 전송을 넘기고,
+    아니면 FileResponse로 직접 보냅니다. (FileResponse가 Range/If-Range 처리)
+    """
+    headers = {
+        "ETag": meta["etag"],
+        "Last-Modified": formatdate(meta["mtime"], usegmt=True),
+        "Cache-Control": DOWNLOAD_CACHE_CONTROL,
+    }
+    if is_not_modified(request, meta):
+        return Response(status_code=304, headers=headers)
+
+    if FILE_DOWNLOAD_X_ACCEL:
+        # 본문은 비워 두고 nginx가 internal location에서 Range 포함 전송을 처리합니다.
+        headers["X-Accel-Redirect"] = f"{X_ACCEL_PREFIX}{quote(meta['filepath'])}"
+        headers["Content-Disposition"] = content_disposition(meta["filename"])
+        return Response(media_type=meta["mimetype"], headers=headers)
+
+    return FileResponse(path=path, filename=meta["filename"], media_type=meta["mimetype"], headers=headers)
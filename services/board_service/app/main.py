@@ -1,24 +1,35 @@
 import os
 from pathlib import Path
-import uuid
 from typing import List, Optional
-import aiofiles
 
-from fastapi import FastAPI, Depends, HTTPException, status, Form, UploadFile, File, Query
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Depends, HTTPException, status, Form, UploadFile, File, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from sqlmodel import Session, select
+from sqlmodel import Session, select, or_, and_, func
+from sqlalchemy import delete
+from sqlalchemy.dialects.mysql import match
 from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from schemas import PaginatedResponse
+from schemas import PaginatedResponse, PostDetail, PostSearchResponse, CommentRead, PostWithComments
+from pagination import encode_cursor, decode_cursor
 
 # database.py에서 DB 관련 함수 임포트
-from database import get_session, init_db
+from database import get_session, get_read_session, init_db, pool_metrics
 
 # models.py에서 모델 및 헬퍼 함수 임포트
-from models import Post, Comment, PostFile, hash_password, verify_password, SEOUL_TZ, PostBase, CommentBase, PostFileBase
+from models import Post, Comment, PostFile, SEOUL_TZ, PostBase, CommentBase, PostFileBase
+from password_hasher import hash_password, verify_password, password_hasher
+from post_counter import get_post_count, adjust_post_count
+from post_cache import get_post_detail, load_post_detail, invalidate_post_detail
+from file_download import build_file_meta, get_file_meta, invalidate_file_meta, file_response, FILE_DOWNLOAD_X_ACCEL
+from uploads import save_uploads, discard_uploads, finalize_uploads, remove_unreferenced
+from cache_version import get_cache_version, bump_cache_version
+from search import parse_terms, to_boolean_query, highlight, search_cache_key, get_cached_search, set_cached_search, SNIPPET_LENGTH
+from view_counter import (
+    get_view_counts, view_key, record_view, client_fingerprint, ViewCoalescer,
+    VIEW_SYNC_QUEUE, VIEW_COALESCE_MS,
+)
 
 # 환경 변수 로드 (database.py에서도 로드하지만, main에서도 필요할 수 있으므로 추가)
 from dotenv import load_dotenv
@@ -52,6 +63,8 @@ UPLOAD_DIR = Path("/app/uploads")
 
 # Redis 클라이언트 변수 초기화
 redis_client: Optional[redis.Redis] = None # <--- Redis 클라이언트 변수 선언
+# VIEW_COALESCE_MS > 0 일 때만 사용하는 조회수 일괄 반영기
+view_coalescer: Optional[ViewCoalescer] = None
 
 # --- 앱 시작 시 실행될 함수 ---
 @app.on_event("startup")
@@ -75,13 +88,42 @@ async def on_startup():
         # Redis 연결이 필수적이라면 여기서 애플리케이션 시작을 중단할 수 있습니다.
         raise HTTPException(status_code=500, detail="Redis connection failed")
 
+    global view_coalescer
+    if VIEW_COALESCE_MS > 0:
+        view_coalescer = ViewCoalescer(redis_client)
+        view_coalescer.start()
+
 
 @app.on_event("shutdown")
 async def on_shutdown():
+    # 모아둔 조회수를 먼저 반영
+    if view_coalescer:
+        await view_coalescer.stop()
     # Redis 연결 종료
     if redis_client:
         await redis_client.aclose()
         print("Redis 연결 종료.")
+    password_hasher.shutdown()
+
+# --- 내부 지표 (게이트웨이를 거치지 않는 내부용) ---
+@app.get("/metrics")
+async def get_metrics():
+    return {"password_hashing": password_hasher.stats(), "db_pool": pool_metrics()}
+
+# 댓글 페이지 크기 (게시글 상세와 함께 내려주는 첫 페이지 / 목록 API 최대값)
+COMMENT_PAGE_SIZE = int(os.getenv("COMMENT_PAGE_SIZE", "50"))
+MAX_COMMENT_PAGE_SIZE = 100
+
+# 게시판 글 변경 시 올리는 캐시 버전 이름 (검색 결과 캐시 등이 이 버전을 키에 포함)
+BOARD_CACHE_VERSION = "board"
+
+async def count_file_references(session: AsyncSession, filepath: str) -> int:
+    """같은 저장 파일을 가리키는 첨부 파일 행 수"""
+    result = await session.exec(select(func.count(PostFile.id)).where(PostFile.filepath == filepath))
+    count = result.one()
+    # 다음 호출이 최신 커밋을 보도록 읽기 트랜잭션을 끝냅니다. (REPEATABLE READ 스냅샷 재사용 방지)
+    await session.rollback()
+    return count
 
 # --- API 엔드포인트 ---
 
@@ -97,6 +139,9 @@ async def create_post(
     files: Optional[List[UploadFile]] = File(None), # 파일은 선택 사항
     session: AsyncSession = Depends(get_session)
 ):
+    # 파일을 먼저 디스크에 저장 (크기 제한 초과 시 게시글을 만들기 전에 413으로 중단)
+    uploads = await save_uploads([file for file in files or [] if file.filename], str(UPLOAD_DIR))
+
     new_post = Post(
         title=title,
         content=content,
@@ -104,32 +149,26 @@ async def create_post(
         created_at=datetime.now(SEOUL_TZ),
         updated_at=datetime.now(SEOUL_TZ)
     )
-    new_post.set_password(password) # 비밀번호 해싱 및 설정
-
-    session.add(new_post)
-    await session.commit()
-    await session.refresh(new_post) # id를 포함한 최신 정보 로드
-
-    if files:
-        for file in files:
-            if file.filename: # 파일명이 있는 경우에만 처리
-                file_extension = file.filename.split(".")[-1] if "." in file.filename else ""
-                unique_filename = f"{uuid.uuid4()}.{file_extension}" if file_extension else str(uuid.uuid4())
-                file_path_on_server = UPLOAD_DIR / unique_filename
-
-                async with aiofiles.open(file_path_on_server, "wb") as f:
-                    content_bytes = await file.read()
-                    await f.write(content_bytes)
-
-                post_file = PostFile(
-                    filename=file.filename,
-                    filepath=unique_filename,
-                    mimetype=file.content_type,
-                    post_id=new_post.id
-                )
-                session.add(post_file)
+    try:
+        new_post.password = await hash_password(password) # 비밀번호 해싱 (스레드 풀에서 실행)
+
+        session.add(new_post)
+        await session.flush() # 파일 행에 쓸 id 확보 (게시글과 같은 트랜잭션에서 커밋)
+        for upload in uploads:
+            session.add(PostFile(
+                filename=upload.original_filename,
+                filepath=upload.filename,
+                mimetype=upload.content_type,
+                post_id=new_post.id
+            ))
         await session.commit()
-        await session.refresh(new_post) # 파일 관계가 로드되도록 다시 refresh
+    except BaseException:
+        await discard_uploads(uploads)
+        raise
+    await finalize_uploads(uploads)
+    await session.refresh(new_post) # id를 포함한 최신 정보 로드
+    await adjust_post_count(redis_client, 1)
+    await bump_cache_version(redis_client, BOARD_CACHE_VERSION)
 
     return new_post
 
@@ -138,73 +177,171 @@ async def create_post(
 async def get_all_posts(
     page: int = Query(1, ge=1, description="페이지 번호 (1부터 시작)"),
     size: int = Query(10, ge=1, le=100, description="페이지당 항목 수"),
-    session: AsyncSession = Depends(get_session)
+    cursor: Optional[str] = Query(None, description="이전 응답의 next_cursor (지정 시 page 대신 사용)"),
+    session: AsyncSession = Depends(get_read_session)
 ):
-    total_statement = select(Post)
-    total_count_result = await session.exec(total_statement)
-    total_items = len(total_count_result.all())
+    # 전체 행을 읽지 않고 Redis 카운터(없으면 COUNT(*))로 총 개수 계산
+    total_items = await get_post_count(redis_client, session)
 
     total_pages = (total_items + size - 1) // size if total_items > 0 else 0
 
-    skip = (page - 1) * size
+    statement = select(Post).order_by(Post.created_at.desc(), Post.id.desc())
+    if cursor:
+        # keyset 페이지네이션: 건너뛸 행을 스캔하지 않고 (created_at, id) 인덱스에서 바로 이어서 읽음
+        last_created_at, last_id = decode_cursor(cursor, 2)
+        try:
+            last_created_at = datetime.fromisoformat(last_created_at)
+            last_id = int(last_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        statement = statement.where(
+            or_(
+                Post.created_at < last_created_at,
+                and_(Post.created_at == last_created_at, Post.id < last_id),
+            )
+        )
+    else:
+        skip = (page - 1) * size
+        statement = statement.offset(skip)
 
-    statement = select(Post).order_by(Post.created_at.desc()).offset(skip).limit(size)
-    posts = await session.exec(statement)
+    posts = await session.exec(statement.limit(size))
     items_on_page = posts.all()
 
-    # Redis에 있는 최신 조회수를 반영하여 응답 (선택 사항)
-    # 실제로는 워커가 주기적으로 DB에 동기화하므로, 여기서는 DB 데이터만 반환해도 무방합니다.
-    # 하지만 실시간으로 Redis 조회수를 보여주고 싶다면 아래 로직 추가
-    updated_items = []
-    if redis_client:
-        for post in items_on_page:
-            redis_views = await redis_client.get(f"views:post:{post.id}")
-            if redis_views:
-                post.views = int(redis_views) # Redis에 있는 조회수로 업데이트
-            updated_items.append(post)
-    else:
-        updated_items = items_on_page
+    next_cursor = None
+    if len(items_on_page) == size:
+        last_post = items_on_page[-1]
+        next_cursor = encode_cursor(last_post.created_at.isoformat(), last_post.id)
 
+    # Redis에 있는 최신 조회수를 반영하여 응답 (MGET 한 번으로 페이지 전체 조회)
+    # 실제로는 워커가 주기적으로 DB에 동기화하므로, Redis 값이 없으면 DB 값을 그대로 사용합니다.
+    redis_views = await get_view_counts(redis_client, [post.id for post in items_on_page])
+    updated_items = []
+    for post in items_on_page:
+        if post.id in redis_views:
+            post.views = redis_views[post.id] # Redis에 있는 조회수로 업데이트
+        updated_items.append(post)
 
     return PaginatedResponse(
         total=total_items,
         page=page,
         size=size,
         pages=total_pages,
-        items=[item.model_dump() for item in updated_items]
+        items=[item.model_dump() for item in updated_items],
+        next_cursor=next_cursor
     )
 
+### 게시글 검색 (/{post_id} 보다 먼저 등록해야 "search"가 post_id로 해석되지 않음)
+@app.get("/api/board/posts/search", response_model=PostSearchResponse)
+async def search_posts(
+    q: str = Query(..., min_length=1, max_length=100, description="검색어 (공백으로 구분된 단어를 모두 포함하는 글)"),
+    size: int = Query(10, ge=1, le=50, description="페이지당 항목 수"),
+    cursor: Optional[str] = Query(None, description="이전 응답의 next_cursor"),
+    session: AsyncSession = Depends(get_read_session)
+):
+    terms = parse_terms(q)
+    if not terms:
+        return PostSearchResponse(query=q)
+
+    # 글이 바뀌면 버전이 올라가 이전 결과 캐시는 더 이상 사용되지 않음
+    version = await get_cache_version(redis_client, BOARD_CACHE_VERSION)
+    cache_key = search_cache_key("board", version, terms, size, cursor)
+    result = await get_cached_search(redis_client, cache_key)
+
+    if result is None:
+        # MATCH ... AGAINST 점수 순(동점이면 id 역순)으로 정렬하고 (score, id)로 이어서 읽음
+        score = match(Post.title, Post.content, against=to_boolean_query(terms)).in_boolean_mode()
+        statement = (
+            select(Post.id, Post.title, Post.content, Post.nickname, Post.views, Post.created_at, score.label("score"))
+            .where(score > 0)
+            .order_by(score.desc(), Post.id.desc())
+        )
+        if cursor:
+            last_score, last_id = decode_cursor(cursor, 2)
+            if not isinstance(last_score, (int, float)) or not isinstance(last_id, int):
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            statement = statement.where(
+                or_(score < last_score, and_(score == last_score, Post.id < last_id))
+            )
+        rows = (await session.exec(statement.limit(size))).all()
+
+        items = [
+            {
+                "id": row.id,
+                "title": row.title,
+                "nickname": row.nickname,
+                "views": row.views,
+                "created_at": row.created_at,
+                "score": float(row.score),
+                "title_highlight": highlight(row.title, terms),
+                "snippet": highlight(row.content, terms, SNIPPET_LENGTH),
+            }
+            for row in rows
+        ]
+        next_cursor = encode_cursor(items[-1]["score"], items[-1]["id"]) if len(items) == size else None
+        result = {"query": q, "items": items, "next_cursor": next_cursor}
+        await set_cached_search(redis_client, cache_key, result)
+
+    # 조회수는 캐시와 무관하게 Redis의 최신 값으로 덮어씀
+    redis_views = await get_view_counts(redis_client, [item["id"] for item in result["items"]])
+    for item in result["items"]:
+        item["views"] = redis_views.get(item["id"], item["views"])
+    result["query"] = q
+    return result
+
 ### 특정 게시글 조회 (조회수 Redis 증가 및 큐에 추가)
-@app.get("/api/board/posts/{post_id}", response_model=Post)
-async def get_post_by_id(post_id: int, session: AsyncSession = Depends(get_session)):
-    statement = select(Post).where(Post.id == post_id)
-    post = await session.exec(statement)
-    found_post = post.first()
+async def load_post_for_view(post_id: int, request: Request, session: AsyncSession) -> dict:
+    """게시글 상세(캐시)를 가져오고 조회수를 기록한 뒤, 최신 조회수를 반영한 dict를 반환합니다."""
+    # 게시글 본문/파일/댓글 수는 Redis read-through 캐시에서 가져옴 (미스 시 DB 조회 1회로 합침)
+    found_post = await get_post_detail(redis_client, post_id, lambda: load_post_detail(session, post_id))
 
     if not found_post:
         raise HTTPException(status_code=404, detail="Post not found")
 
     # --- Redis 조회수 증가 및 동기화 큐에 추가 ---
     if redis_client:
-        redis_key = f"views:post:{post_id}"
-        # Redis 조회수 1 증가 (없으면 0에서 시작)
-        current_redis_views = await redis_client.incr(redis_key)
-        # 동기화가 필요한 게시물 ID를 큐에 추가 (Sorted Set 사용, score는 현재 시간 또는 아무 값)
-        await redis_client.zadd("view_sync_queue", {str(post_id): datetime.now().timestamp()}) # 현재 시간을 score로 사용
-
-        # DB 모델의 조회수를 Redis에서 가져온 최신 값으로 업데이트하여 반환
-        found_post.views = current_redis_views
+        client_host = request.client.host if request.client else None
+        fingerprint = client_fingerprint(request.headers, client_host)
+        if view_coalescer:
+            # 로컬 버퍼에 쌓고 주기적으로 INCRBY 배치로 반영 (조회당 Redis 왕복 없음)
+            view_coalescer.record(post_id, found_post["views"], fingerprint)
+            known_views = view_coalescer.known_views(post_id)
+            if known_views is None:
+                known_views = (await get_view_counts(redis_client, [post_id])).get(post_id, found_post["views"])
+                view_coalescer.remember(post_id, known_views)
+            found_post["views"] = known_views + view_coalescer.pending_views(post_id)
+        else:
+            # INCR + 동기화 큐 ZADD를 Lua 스크립트 한 번으로 원자적으로 처리
+            current_redis_views = await record_view(redis_client, post_id, found_post["views"], fingerprint)
+            if current_redis_views is not None:
+                # 응답의 조회수를 Redis의 최신 값으로 업데이트하여 반환
+                found_post["views"] = current_redis_views
         # DB에는 바로 커밋하지 않음 (워커가 처리할 것임)
     else:
         # Redis 연결이 안 되어있다면 기존 DB 직접 업데이트 로직 유지 (폴백)
-        found_post.views += 1
-        session.add(found_post)
+        db_post = await session.get(Post, post_id)
+        db_post.views += 1
+        session.add(db_post)
         await session.commit()
-        await session.refresh(found_post)
-
+        found_post["views"] = db_post.views
 
     return found_post
 
+@app.get("/api/board/posts/{post_id}", response_model=PostDetail)
+async def get_post_by_id(post_id: int, request: Request, session: AsyncSession = Depends(get_session)):
+    return await load_post_for_view(post_id, request, session)
+
+### 게시글 상세 + 댓글 첫 페이지 (댓글 수와 무관하게 최대 3번의 쿼리)
+@app.get("/api/board/posts/{post_id}/with-comments", response_model=PostWithComments)
+async def get_post_with_comments(
+    post_id: int,
+    request: Request,
+    comment_limit: int = Query(COMMENT_PAGE_SIZE, ge=1, le=MAX_COMMENT_PAGE_SIZE, description="함께 가져올 댓글 수"),
+    session: AsyncSession = Depends(get_session)
+):
+    found_post = await load_post_for_view(post_id, request, session)
+    comments, next_cursor = await load_comment_page(session, post_id, comment_limit)
+    return PostWithComments.model_validate(found_post, update={"comments": comments, "next_comment_cursor": next_cursor})
+
 ### 게시글 수정
 @app.put("/api/board/posts/{post_id}", response_model=Post)
 async def update_post(
@@ -221,7 +358,7 @@ async def update_post(
     if not found_post:
         raise HTTPException(status_code=404, detail="Post not found")
 
-    if not verify_password(password, found_post.password):
+    if not await verify_password(password, found_post.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
 
     if title is not None:
@@ -233,6 +370,8 @@ async def update_post(
     session.add(found_post)
     await session.commit()
     await session.refresh(found_post)
+    await invalidate_post_detail(redis_client, post_id)
+    await bump_cache_version(redis_client, BOARD_CACHE_VERSION)
     return found_post
 
 ### 게시글 삭제
@@ -249,29 +388,69 @@ async def delete_post(
     if not found_post:
         raise HTTPException(status_code=404, detail="Post not found")
 
-    if not verify_password(password, found_post.password):
+    if not await verify_password(password, found_post.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
 
-    # 관련 파일 삭제 (실제 파일 시스템에서도 삭제)
-    for file_obj in found_post.files:
-        file_path_on_server = UPLOAD_DIR / file_obj.filepath
-        if file_path_on_server.exists():
-            os.remove(file_path_on_server)
-    
-    session.delete(found_post)
+    # 첨부 파일/댓글 행을 함께 삭제 (관계를 지연 로딩하지 않고 한 문장씩 처리)
+    file_result = await session.exec(select(PostFile.id, PostFile.filepath).where(PostFile.post_id == post_id))
+    post_files = file_result.all()
+    filepaths = [filepath for _, filepath in post_files]
+    await session.execute(delete(PostFile).where(PostFile.post_id == post_id))
+    await session.execute(delete(Comment).where(Comment.post_id == post_id))
+    await session.delete(found_post)
     await session.commit()
 
+    # 실제 파일은 다른 게시글이 같은 파일을 참조하지 않을 때만 삭제
+    await remove_unreferenced(str(UPLOAD_DIR), filepaths, lambda name: count_file_references(session, name))
+    await invalidate_file_meta(redis_client, [file_id for file_id, _ in post_files])
+
+    await adjust_post_count(redis_client, -1)
+    await invalidate_post_detail(redis_client, post_id)
+    await bump_cache_version(redis_client, BOARD_CACHE_VERSION)
+
     # 게시글 삭제 시 Redis의 조회수 캐시 및 큐에서도 제거 (선택 사항)
+    if view_coalescer:
+        view_coalescer.discard(post_id)
     if redis_client:
-        await redis_client.delete(f"views:post:{post_id}")
-        await redis_client.zrem("view_sync_queue", str(post_id))
+        await redis_client.delete(view_key(post_id))
+        await redis_client.zrem(VIEW_SYNC_QUEUE, str(post_id))
 
     return
 
 ## 댓글 (Comments) 관련 엔드포인트
 
+async def load_comment_page(session: AsyncSession, post_id: int, limit: int, cursor: Optional[str] = None):
+    """
+    작성 순(id 오름차순) 댓글 한 페이지와 다음 페이지 커서를 반환합니다.
+    (post_id, id) 인덱스를 따라 읽으므로 앞쪽 댓글 수와 무관하게 쿼리 1번입니다.
+    """
+    statement = select(Comment).where(Comment.post_id == post_id)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        if not isinstance(last_id, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        statement = statement.where(Comment.id > last_id)
+    result = await session.exec(statement.order_by(Comment.id).limit(limit))
+    comments = [CommentRead.model_validate(comment) for comment in result.all()]
+    next_cursor = encode_cursor(comments[-1].id) if len(comments) == limit else None
+    return comments, next_cursor
+
+### 댓글 목록 조회 (응답은 기존 프론트엔드와 같은 배열, 다음 페이지 커서는 X-Next-Cursor 헤더)
+@app.get("/api/board/posts/{post_id}/comments/", response_model=List[CommentRead])
+async def list_comments(
+    post_id: int,
+    response: Response,
+    limit: int = Query(MAX_COMMENT_PAGE_SIZE, ge=1, le=MAX_COMMENT_PAGE_SIZE, description="페이지당 댓글 수"),
+    cursor: Optional[str] = Query(None, description="이전 응답의 X-Next-Cursor 헤더 값"),
+    session: AsyncSession = Depends(get_session)
+):
+    comments, next_cursor = await load_comment_page(session, post_id, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return comments
+
 ### 댓글 생성
-@app.post("/api/board/posts/{post_id}/comments/", response_model=Comment)
+@app.post("/api/board/posts/{post_id}/comments/", response_model=CommentRead)
 async def create_comment(
     post_id: int,
     nickname: str = Form(...),
@@ -292,15 +471,16 @@ async def create_comment(
         post_id=post_id,
         created_at=datetime.now(SEOUL_TZ)
     )
-    new_comment.set_password(password)
+    new_comment.password = await hash_password(password)
 
     session.add(new_comment)
     await session.commit()
     await session.refresh(new_comment)
+    await invalidate_post_detail(redis_client, post_id)
     return new_comment
 
 ### 댓글 수정
-@app.put("/api/board/comments/{comment_id}", response_model=Comment)
+@app.put("/api/board/comments/{comment_id}", response_model=CommentRead)
 async def update_comment(
     comment_id: int,
     password: str = Form(...),
@@ -314,13 +494,14 @@ async def update_comment(
     if not found_comment:
         raise HTTPException(status_code=404, detail="Comment not found")
 
-    if not verify_password(password, found_comment.password):
+    if not await verify_password(password, found_comment.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
 
     found_comment.content = content
     session.add(found_comment)
     await session.commit()
     await session.refresh(found_comment)
+    await invalidate_post_detail(redis_client, found_comment.post_id)
     return found_comment
 
 ### 댓글 삭제
@@ -337,27 +518,35 @@ async def delete_comment(
     if not found_comment:
         raise HTTPException(status_code=404, detail="Comment not found")
 
-    if not verify_password(password, found_comment.password):
+    if not await verify_password(password, found_comment.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
 
-    session.delete(found_comment)
+    post_id = found_comment.post_id
+    await session.delete(found_comment)
     await session.commit()
+    await invalidate_post_detail(redis_client, post_id)
     return
 
 ## 파일 (Files) 관련 엔드포인트
 
 ### 파일 다운로드
-@app.get("/api/board/files/{file_id}")
-async def download_file(file_id: int, session: AsyncSession = Depends(get_session)):
-    statement = select(PostFile).where(PostFile.id == file_id)
-    file_record_result = await session.exec(statement)
-    found_file = file_record_result.first()
-
-    if not found_file:
+@app.api_route("/api/board/files/{file_id}", methods=["GET", "HEAD"])
+async def download_file(file_id: int, request: Request, session: AsyncSession = Depends(get_session)):
+    async def load_meta():
+        found_file = await session.get(PostFile, file_id)
+        if not found_file:
+            return None
+        return build_file_meta(str(UPLOAD_DIR / found_file.filepath), found_file.filepath, found_file.filename, found_file.mimetype)
+
+    # 메타데이터는 file_id 기준으로 Redis에 캐시 (다운로드마다 DB 조회하지 않음)
+    meta = await get_file_meta(redis_client, file_id, load_meta)
+    if not meta:
         raise HTTPException(status_code=404, detail="File not found")
 
-    file_path = UPLOAD_DIR / found_file.filepath
-    if not file_path.exists():
+    file_path = UPLOAD_DIR / meta["filepath"]
+    if not FILE_DOWNLOAD_X_ACCEL and not file_path.exists():
+        await invalidate_file_meta(redis_client, [file_id])
         raise HTTPException(status_code=404, detail="File not found on server")
 
-    return FileResponse(path=str(file_path), filename=found_file.filename, media_type=found_file.mimetype)
\ No newline at end of file
+    # ETag/Last-Modified 조건부 요청(304), Range 요청(206), X-Accel-Redirect 모드 처리
+    return file_response(request, meta, str(file_path))
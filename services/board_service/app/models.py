@@ -2,21 +2,10 @@ from datetime import datetime
 from typing import Optional, List
 from sqlmodel import Field, SQLModel, Relationship
 from zoneinfo import ZoneInfo
-from passlib.context import CryptContext
-from sqlalchemy import Column, TEXT
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from sqlalchemy import Column, TEXT, Index
 
 SEOUL_TZ = ZoneInfo("Asia/Seoul")
 
-def hash_password(password: str) -> str:
-    """주어진 비밀번호를 해싱합니다."""
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """평문 비밀번호와 해싱된 비밀번호를 비교합니다."""
-    return pwd_context.verify(plain_password, hashed_password)
-
 # 게시글 모델
 class PostBase(SQLModel):
     title: str = Field(index=True)
@@ -28,14 +17,17 @@ class PostBase(SQLModel):
     updated_at: datetime = Field(default_factory=lambda: datetime.now(SEOUL_TZ))
 
 class Post(PostBase, table=True):
+    __table_args__ = (
+        # 목록의 keyset 페이지네이션 (created_at DESC, id DESC) 용 복합 인덱스
+        Index("ix_post_created_at_id", "created_at", "id"),
+        # 제목/본문 검색용 FULLTEXT 인덱스 (한국어는 띄어쓰기만으로 나눌 수 없어 ngram 파서 사용, MySQL 전용)
+        Index("ft_post_title_content", "title", "content", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     files: List["PostFile"] = Relationship(back_populates="post")
     comments: List["Comment"] = Relationship(back_populates="post")
 
-    def set_password(self, plain_password: str):
-        """평문 비밀번호를 받아 해싱하여 이 모델 인스턴스의 password 필드에 저장합니다."""
-        self.password = hash_password(plain_password)
-
 # 댓글 모델 (새로 추가)
 class CommentBase(SQLModel):
     post_id: int = Field(foreign_key="post.id")
@@ -45,17 +37,17 @@ class CommentBase(SQLModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(SEOUL_TZ))
 
 class Comment(CommentBase, table=True):
+    # 게시글별 댓글 keyset 페이지네이션 (post_id = ? AND id > ? ORDER BY id) 용 복합 인덱스
+    __table_args__ = (Index("ix_comment_post_id_id", "post_id", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     post: Optional[Post] = Relationship(back_populates="comments")
 
-    def set_password(self, plain_password: str):
-        """평문 비밀번호를 받아 해싱하여 이 모델 인스턴스의 password 필드에 저장합니다."""
-        self.password = hash_password(plain_password)
-
 # PostFile 모델은 기존과 동일하게 유지
 class PostFileBase(SQLModel):
     filename: str
-    filepath: str
+    # 저장 파일명 "<sha256><확장자>" (같은 내용이면 여러 행이 같은 파일을 가리킴)
+    filepath: str = Field(index=True)
     mimetype: str
     post_id: Optional[int] = Field(default=None, foreign_key="post.id")
 
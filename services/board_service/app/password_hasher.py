@@ -0,0 +1,79 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# bcrypt 해싱/검증을 실행할 스레드 수 (bcrypt는 C 구현에서 GIL을 풀기 때문에 스레드로 병렬 처리됩니다)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 실행 중 + 대기 중인 작업이 이 값을 넘으면 429로 거절합니다.
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+
+
+class PasswordHasher:
+    """이벤트 루프를 막지 않도록 bcrypt 연산을 제한된 스레드 풀에서 실행합니다."""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    async def _run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="요청이 많습니다. 잠시 후 다시 시도해주세요.",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(pwd_context.verify, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        """큐 깊이 지표 (running: 실행 중, queued: 스레드를 기다리는 작업 수)"""
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "running": min(self.pending, self.workers),
+            "queued": max(self.pending - self.workers, 0),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher()
+
+
+async def hash_password(password: str) -> str:
+    """주어진 비밀번호를 해싱합니다."""
+    return await password_hasher.hash(password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """평문 비밀번호와 해싱된 비밀번호를 비교합니다."""
+    return await password_hasher.verify(plain_password, hashed_password)
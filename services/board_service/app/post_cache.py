@@ -0,0 +1,91 @@
+import os
+import json
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional
+
+import redis.asyncio as redis
+from sqlalchemy.orm import selectinload
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import Post, Comment
+from schemas import PostDetail
+
+# 직렬화된 게시글 상세(파일 목록, 댓글 수 포함) 캐시
+POST_DETAIL_KEY_PREFIX = "post:detail:"
+POST_DETAIL_TTL_SECONDS = int(os.getenv("POST_DETAIL_TTL_SECONDS", "60"))
+
+# 같은 게시글의 캐시 미스를 프로세스 내에서 하나의 DB 조회로 합치기 위한 진행 중 작업
+_inflight: Dict[int, "asyncio.Future[Optional[dict]]"] = {}
+
+
+def post_detail_key(post_id) -> str:
+    return f"{POST_DETAIL_KEY_PREFIX}{post_id}"
+
+
+async def load_post_detail(session: AsyncSession, post_id: int) -> Optional[dict]:
+    """게시글 + 첨부파일(selectinload) + 댓글 수를 조회해 JSON 직렬화 가능한 dict로 반환합니다."""
+    statement = select(Post).where(Post.id == post_id).options(selectinload(Post.files))
+    result = await session.exec(statement)
+    post = result.first()
+    if not post:
+        return None
+
+    count_result = await session.exec(select(func.count(Comment.id)).where(Comment.post_id == post_id))
+    detail = PostDetail.model_validate(
+        post, update={"files": post.files, "comment_count": count_result.one()}
+    )
+    return detail.model_dump(mode="json")
+
+
+async def get_post_detail(
+    redis_client: Optional[redis.Redis],
+    post_id: int,
+    loader: Callable[[], Awaitable[Optional[dict]]],
+) -> Optional[dict]:
+    """
+    Read-through 캐시: Redis에 있으면 그대로 반환하고, 없으면 loader로 DB에서 읽어 채웁니다.
+    동시에 들어온 같은 게시글의 캐시 미스는 진행 중인 하나의 loader 결과를 함께 기다립니다.
+    """
+    if redis_client:
+        cached = await redis_client.get(post_detail_key(post_id))
+        if cached is not None:
+            return json.loads(cached)
+
+    while True:
+        inflight = _inflight.get(post_id)
+        if inflight is None:
+            break
+        try:
+            detail = await asyncio.shield(inflight)
+        except asyncio.CancelledError:
+            # 먼저 조회하던 요청만 취소된 경우(클라이언트 연결 끊김)에는 이 요청이 다시 조회합니다.
+            if inflight.cancelled() and not asyncio.current_task().cancelling():
+                continue
+            raise
+        return dict(detail) if detail is not None else None
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[post_id] = future
+    try:
+        detail = await loader()
+        if detail is not None and redis_client:
+            await redis_client.set(post_detail_key(post_id), json.dumps(detail), ex=POST_DETAIL_TTL_SECONDS)
+        future.set_result(detail)
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # 기다리는 요청이 없어도 경고가 남지 않도록 조회 처리
+        raise
+    except BaseException:
+        # 취소는 기다리는 요청에 전파하지 않고, 그중 하나가 이어서 조회하도록 합니다.
+        future.cancel()
+        raise
+    finally:
+        _inflight.pop(post_id, None)
+    return dict(detail) if detail is not None else None
+
+
+async def invalidate_post_detail(redis_client: Optional[redis.Redis], post_id: int):
+    """게시글/댓글 변경 시 상세 캐시를 삭제합니다."""
+    if redis_client:
+        await redis_client.delete(post_detail_key(post_id))
@@ -0,0 +1,55 @@
+import os
+from typing import Optional
+
+import redis.asyncio as redis
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import Post
+
+# 전체 게시글 수 카운터 (게시글 생성/삭제 시 증감, 워커가 주기적으로 COUNT(*)로 보정)
+POST_COUNT_KEY = "board:posts:total"
+# 카운터가 어긋나더라도 최대 이 시간 안에는 DB 값으로 다시 채워집니다.
+POST_COUNT_TTL_SECONDS = int(os.getenv("POST_COUNT_TTL_SECONDS", "600"))
+
+# 키가 있을 때만 증감합니다. 키가 없으면 다음 조회 때 COUNT(*)로 채워집니다.
+ADJUST_IF_EXISTS_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return false
+"""
+
+
+async def count_posts_in_db(session: AsyncSession) -> int:
+    """SELECT COUNT(id) FROM post (행 데이터를 읽어오지 않음)"""
+    result = await session.exec(select(func.count(Post.id)))
+    return result.one()
+
+
+async def get_post_count(redis_client: Optional[redis.Redis], session: AsyncSession) -> int:
+    """Redis 카운터를 우선 사용하고, 없으면 COUNT(*) 결과로 채웁니다."""
+    if redis_client:
+        cached = await redis_client.get(POST_COUNT_KEY)
+        if cached is not None:
+            return int(cached)
+
+    total = await count_posts_in_db(session)
+    if redis_client:
+        # 그 사이 다른 요청이 채웠다면 덮어쓰지 않음
+        await redis_client.set(POST_COUNT_KEY, total, ex=POST_COUNT_TTL_SECONDS, nx=True)
+    return total
+
+
+async def adjust_post_count(redis_client: Optional[redis.Redis], delta: int):
+    """게시글 생성(+1)/삭제(-1) 시 카운터를 갱신합니다."""
+    if redis_client:
+        script = redis_client.register_script(ADJUST_IF_EXISTS_LUA)
+        await script(keys=[POST_COUNT_KEY], args=[delta])
+
+
+async def reconcile_post_count(redis_client: redis.Redis, session: AsyncSession) -> int:
+    """DB의 실제 게시글 수로 카운터를 다시 맞춥니다. (워커에서 주기적으로 호출)"""
+    total = await count_posts_in_db(session)
+    await redis_client.set(POST_COUNT_KEY, total, ex=POST_COUNT_TTL_SECONDS)
+    return total
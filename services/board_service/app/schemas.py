@@ -1,9 +1,56 @@
+from datetime import datetime
 from typing import Optional, List
 from sqlmodel import Field, SQLModel
+from models import PostFileBase
 
 class PaginatedResponse(SQLModel):
   total: int
   page: int
   size: int
   pages: int
-  items: List[dict] = []
\ No newline at end of file
+  items: List[dict] = []
+  next_cursor: Optional[str] = None
+
+class PostFileRead(PostFileBase):
+  id: int
+
+# 게시글 상세 응답 (비밀번호 해시는 포함하지 않음)
+class PostDetail(SQLModel):
+  id: int
+  title: str
+  content: str
+  nickname: str
+  views: int
+  created_at: datetime
+  updated_at: datetime
+  files: List[PostFileRead] = []
+  comment_count: int = 0
+
+# 댓글 응답 (비밀번호 해시는 포함하지 않음)
+class CommentRead(SQLModel):
+  id: int
+  post_id: int
+  content: str
+  nickname: str
+  created_at: datetime
+
+# 게시글 상세 + 댓글 첫 페이지
+class PostWithComments(PostDetail):
+  comments: List[CommentRead] = []
+  next_comment_cursor: Optional[str] = None
+
+# 검색 결과 (title_highlight/snippet은 HTML 이스케이프 후 <mark>로 검색어를 감싼 값)
+class PostSearchItem(SQLModel):
+  id: int
+  title: str
+  nickname: str
+  views: int
+  created_at: datetime
+  score: float
+  title_highlight: str
+  snippet: str
+
+class PostSearchResponse(SQLModel):
+  query: str
+  items: List[PostSearchItem] = []
+  next_cursor: Optional[str] = None
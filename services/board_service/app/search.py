@@ -0,0 +1,69 @@
+import os
+import re
+import json
+import html
+import hashlib
+from typing import Any, List, Optional
+
+import redis.asyncio as redis
+
+# 검색 결과 캐시 유효 시간. 키에 캐시 버전이 들어가므로 글이 바뀌면 이전 결과는 더 이상 조회되지 않습니다.
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "60"))
+# ngram_token_size(기본 2)보다 짧은 검색어는 FULLTEXT 인덱스로 찾을 수 없습니다.
+SEARCH_MIN_TERM_LENGTH = int(os.getenv("SEARCH_MIN_TERM_LENGTH", "2"))
+SEARCH_MAX_TERMS = 5
+SNIPPET_LENGTH = 160
+
+# BOOLEAN MODE 연산자로 해석되는 문자
+_OPERATOR_CHARS = re.compile(r'[+\-<>()~*"@]')
+
+
+def parse_terms(q: str) -> List[str]:
+    """검색어를 공백 기준으로 나누고 연산자 문자/짧은 단어/중복을 제거합니다."""
+    terms = []
+    for term in _OPERATOR_CHARS.sub(" ", q).split():
+        if len(term) >= SEARCH_MIN_TERM_LENGTH and term not in terms:
+            terms.append(term)
+    return terms[:SEARCH_MAX_TERMS]
+
+
+def to_boolean_query(terms: List[str]) -> str:
+    """모든 단어를 포함하는 문서만 찾도록 +"단어" 형태로 만듭니다. (ngram 파서에서 "..."는 연속된 글자 일치)"""
+    return " ".join(f'+"{term}"' for term in terms)
+
+
+def highlight(text: Optional[str], terms: List[str], snippet_length: Optional[int] = None) -> str:
+    """
+    HTML 이스케이프한 text에서 검색어를 <mark>로 감쌉니다.
+    snippet_length를 주면 처음 일치한 위치 주변만 잘라서 반환합니다.
+    """
+    text = text or ""
+    if snippet_length and len(text) > snippet_length:
+        lowered = text.lower()
+        positions = [p for p in (lowered.find(term.lower()) for term in terms) if p >= 0]
+        start = max(0, min(positions) - snippet_length // 4) if positions else 0
+        end = start + snippet_length
+        text = ("…" if start > 0 else "") + text[start:end] + ("…" if end < len(text) else "")
+
+    escaped = html.escape(text)
+    if not terms:
+        return escaped
+    pattern = re.compile("|".join(re.escape(html.escape(term)) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    return pattern.sub(lambda m: f"<mark>{m.group(0)}</mark>", escaped)
+
+
+def search_cache_key(namespace: str, version: int, *params: Any) -> str:
+    digest = hashlib.sha1(json.dumps(params, default=str, ensure_ascii=False).encode()).hexdigest()
+    return f"search:{namespace}:v{version}:{digest}"
+
+
+async def get_cached_search(redis_client: Optional[redis.Redis], key: str) -> Optional[dict]:
+    if not redis_client:
+        return None
+    cached = await redis_client.get(key)
+    return json.loads(cached) if cached else None
+
+
+async def set_cached_search(redis_client: Optional[redis.Redis], key: str, result: dict):
+    if redis_client:
+        await redis_client.set(key, json.dumps(result, default=str, ensure_ascii=False), ex=SEARCH_CACHE_TTL_SECONDS)
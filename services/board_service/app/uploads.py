@@ -0,0 +1,149 @@
+import os
+import uuid
+import hashlib
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException, UploadFile
+
+# 업로드 파일을 한 번에 읽지 않고 이 크기 단위로 나눠 복사합니다.
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+# 파일 하나 / 요청 하나의 최대 크기 (nginx client_max_body_size 10M 과 맞춤)
+MAX_UPLOAD_FILE_BYTES = int(os.getenv("MAX_UPLOAD_FILE_BYTES", str(10 * 1024 * 1024)))
+MAX_UPLOAD_TOTAL_BYTES = int(os.getenv("MAX_UPLOAD_TOTAL_BYTES", str(10 * 1024 * 1024)))
+
+
+class SavedUpload:
+    """
+    임시 파일까지 저장된 업로드 파일 정보.
+    filename은 내용의 SHA-256으로 정해지며, finalize_uploads를 호출해야 그 이름으로 옮겨집니다.
+    """
+
+    def __init__(self, filename: str, path: str, temp_path: str, size: int, sha256: str,
+                 original_filename: Optional[str], content_type: Optional[str]):
+        self.filename = filename
+        self.path = path
+        self.temp_path = temp_path
+        self.size = size
+        self.sha256 = sha256
+        self.original_filename = original_filename
+        self.content_type = content_type
+
+
+class UploadBudget:
+    """한 요청에 포함된 여러 파일의 합계 크기 제한"""
+
+    def __init__(self, max_bytes: int = MAX_UPLOAD_TOTAL_BYTES):
+        self.remaining = max_bytes
+
+    def consume(self, size: int):
+        self.remaining -= size
+        if self.remaining < 0:
+            raise HTTPException(status_code=413, detail="업로드 전체 크기 제한을 초과했습니다.")
+
+
+def file_extension(filename: Optional[str]) -> str:
+    """"photo.JPG" -> ".jpg" (너무 긴 확장자는 버림)"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    return extension if len(extension) <= 10 else ""
+
+
+async def save_upload(
+    file: UploadFile,
+    directory: str,
+    max_file_bytes: int = MAX_UPLOAD_FILE_BYTES,
+    budget: Optional[UploadBudget] = None,
+) -> SavedUpload:
+    """
+    업로드 파일을 청크 단위로 임시 파일에 쓰면서 크기 제한과 SHA-256을 함께 계산합니다.
+    최종 이름은 "<sha256><확장자>" 이므로 같은 내용의 파일은 디스크에 하나만 남습니다.
+    """
+    temp_path = os.path.join(directory, f".{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_file_bytes:
+                    raise HTTPException(status_code=413, detail=f"파일 크기 제한({max_file_bytes} bytes)을 초과했습니다.")
+                if budget:
+                    budget.consume(len(chunk))
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        try:
+            await aiofiles.os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    sha256 = digest.hexdigest()
+    filename = f"{sha256}{file_extension(file.filename)}"
+    return SavedUpload(filename, os.path.join(directory, filename), temp_path, size, sha256,
+                       file.filename, file.content_type)
+
+
+async def finalize_uploads(uploads: Iterable[SavedUpload]):
+    """
+    DB 커밋이 끝난 뒤 호출해 임시 파일을 최종 이름으로 옮깁니다.
+    같은 내용의 파일이 이미 있어도 덮어쓰므로(원자적 rename, 내용 동일) 커밋 직전에
+    다른 요청이 그 파일을 지웠더라도 다시 채워집니다.
+    """
+    for upload in uploads:
+        await aiofiles.os.replace(upload.temp_path, upload.path)
+
+
+async def discard_uploads(uploads: Iterable[SavedUpload]):
+    """DB 저장 실패 등으로 쓰지 않게 된 임시 파일을 지웁니다. (다른 글과 공유될 수 있는 최종 파일은 건드리지 않음)"""
+    for upload in uploads:
+        try:
+            await aiofiles.os.remove(upload.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+async def remove_unreferenced(directory: str, filenames: Iterable[str],
+                              count_references: Callable[[str], Awaitable[int]]) -> List[str]:
+    """
+    삭제 커밋 이후 호출합니다. DB에서 더 이상 참조하지 않는 파일만 지웁니다.
+    (내용 주소 방식이라 같은 파일을 여러 글이 공유할 수 있음) 반환값: 지운 파일명
+
+    같은 내용을 올리는 요청이 동시에 커밋/finalize 할 수 있으므로, 파일을 임시 이름으로 옮긴 뒤
+    참조 수를 다시 세어 그 사이 참조가 생겼으면 되돌립니다. 업로드는 커밋 후에 자기 파일을
+    다시 rename 하므로, 다시 센 뒤에 커밋된 업로드의 파일은 지워지지 않습니다.
+    count_references는 호출할 때마다 최신 커밋 상태를 읽어야 합니다. (읽기 트랜잭션을 끝내고 반환)
+    """
+    removed = []
+    for filename in dict.fromkeys(filenames):
+        if not filename or await count_references(filename) > 0:
+            continue
+        path = os.path.join(directory, filename)
+        trash_path = os.path.join(directory, f".{uuid.uuid4().hex}.trash")
+        try:
+            await aiofiles.os.replace(path, trash_path)
+        except FileNotFoundError:
+            continue
+        if await count_references(filename) > 0:
+            # 그 사이 같은 파일을 참조하는 행이 커밋됨: 되돌림 (이미 새로 채워졌어도 내용은 같음)
+            await aiofiles.os.replace(trash_path, path)
+            continue
+        await aiofiles.os.remove(trash_path)
+        removed.append(filename)
+    return removed
+
+
+async def save_uploads(files: Iterable[UploadFile], directory: str,
+                       max_file_bytes: int = MAX_UPLOAD_FILE_BYTES,
+                       max_total_bytes: int = MAX_UPLOAD_TOTAL_BYTES) -> List[SavedUpload]:
+    """여러 파일을 순서대로 저장합니다. 하나라도 실패하면 이미 저장한 파일도 지웁니다."""
+    budget = UploadBudget(max_total_bytes)
+    saved: List[SavedUpload] = []
+    try:
+        for file in files:
+            saved.append(await save_upload(file, directory, max_file_bytes, budget))
+    except BaseException:
+        await discard_uploads(saved)
+        raise
+    return saved
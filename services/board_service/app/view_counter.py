@@ -0,0 +1,247 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+import redis.asyncio as redis
+
+# 게시글별 실시간 조회수 키와, DB 동기화가 필요한 게시글 ID 큐(Sorted Set)
+VIEW_KEY_PREFIX = "views:post:"
+VIEW_SYNC_QUEUE = "view_sync_queue"
+# 같은 클라이언트의 반복 조회를 무시할 키 prefix
+VIEW_SEEN_PREFIX = "views:seen:"
+
+# 같은 클라이언트가 이 시간(초) 안에 다시 조회하면 조회수를 올리지 않습니다. (0이면 사용 안 함)
+VIEW_DEDUPE_SECONDS = int(os.getenv("VIEW_DEDUPE_SECONDS", "0"))
+# 0보다 크면 조회수를 프로세스 내에서 모았다가 이 간격(ms)마다 일괄 반영합니다.
+VIEW_COALESCE_MS = int(os.getenv("VIEW_COALESCE_MS", "0"))
+
+# 조회수 증가 + 동기화 큐 등록을 한 번의 왕복으로 원자적으로 처리합니다.
+# KEYS[1]=조회수 키, KEYS[2]=동기화 큐, KEYS[3]=중복 조회 방지 키
+# ARGV[1]=증가량, ARGV[2]=큐 score, ARGV[3]=post_id, ARGV[4]=중복 방지 시간(초), ARGV[5]=DB 조회수
+# 키가 없으면 DB 조회수에서 이어서 셉니다. 중복 조회로 무시되면 현재 값(또는 nil)을 반환합니다.
+RECORD_VIEW_LUA = """
+if tonumber(ARGV[4]) > 0 then
+  if not redis.call('SET', KEYS[3], '1', 'NX', 'EX', ARGV[4]) then
+    return redis.call('GET', KEYS[1])
+  end
+end
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  redis.call('SET', KEYS[1], ARGV[5])
+end
+local views = redis.call('INCRBY', KEYS[1], ARGV[1])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[3])
+return views
+"""
+
+
+def view_key(post_id) -> str:
+    return f"{VIEW_KEY_PREFIX}{post_id}"
+
+
+def client_fingerprint(headers, client_host: Optional[str]) -> str:
+    """
+    중복 조회 판단용 클라이언트 식별자 (IP + User-Agent).
+    공개 GET 요청의 X-User-Id / X-Forwarded-For는 클라이언트가 임의로 바꿀 수 있으므로 쓰지 않고,
+    nginx가 덮어쓰는 X-Real-IP(없으면 연결 주소)만 사용합니다.
+    """
+    ip = headers.get("x-real-ip") or client_host or ""
+    return hashlib.sha1(f"{ip}|{headers.get('user-agent', '')}".encode()).hexdigest()[:16]
+
+
+async def get_view_counts(redis_client: Optional[redis.Redis], post_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    여러 게시글의 Redis 조회수를 MGET 한 번으로 가져옵니다.
+    Redis에 값이 없는 게시글은 결과에서 빠집니다.
+    """
+    ids = list(dict.fromkeys(post_ids))
+    if not redis_client or not ids:
+        return {}
+    values = await redis_client.mget([view_key(post_id) for post_id in ids])
+    return {post_id: int(value) for post_id, value in zip(ids, values) if value is not None}
+
+
+def _record_view_args(post_id: int, increment: int, db_views: int, fingerprint: Optional[str], dedupe_seconds: int):
+    seen_key = f"{VIEW_SEEN_PREFIX}{post_id}:{fingerprint or ''}"
+    keys = [view_key(post_id), VIEW_SYNC_QUEUE, seen_key]
+    args = [increment, time.time(), post_id, dedupe_seconds if fingerprint else 0, db_views]
+    return keys, args
+
+
+async def record_view(redis_client: redis.Redis, post_id: int, db_views: int,
+                      fingerprint: Optional[str] = None,
+                      dedupe_seconds: int = VIEW_DEDUPE_SECONDS) -> Optional[int]:
+    """조회 1회를 기록하고 최신 조회수를 반환합니다. (Redis 왕복 1회)"""
+    keys, args = _record_view_args(post_id, 1, db_views, fingerprint, dedupe_seconds)
+    script = redis_client.register_script(RECORD_VIEW_LUA)
+    views = await script(keys=keys, args=args)
+    return int(views) if views is not None else None
+
+
+class ViewCoalescer:
+    """
+    조회수를 프로세스 내에서 모았다가 interval마다 INCRBY 배치(파이프라인 1회)로 반영합니다.
+    인기 게시글에 조회가 몰릴 때 조회 1건당 Redis 연산 수를 줄이기 위한 용도입니다.
+    """
+
+    def __init__(self, redis_client: redis.Redis, interval_ms: int = VIEW_COALESCE_MS,
+                 dedupe_seconds: int = VIEW_DEDUPE_SECONDS, max_tracked: int = 10000):
+        self.redis_client = redis_client
+        self.interval = interval_ms / 1000
+        self.dedupe_seconds = dedupe_seconds
+        self.max_tracked = max_tracked
+        self._script = redis_client.register_script(RECORD_VIEW_LUA)
+        self._pending: Dict[int, int] = {}
+        self._db_views: Dict[int, int] = {}
+        # 마지막 flush 시점의 Redis 조회수 (응답에 pending을 더해 보여주기 위함)
+        self._known: "OrderedDict[int, int]" = OrderedDict()
+        # 프로세스 내 중복 조회 방지 (fingerprint -> 만료 시각)
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    def record(self, post_id: int, db_views: int, fingerprint: Optional[str] = None) -> bool:
+        """조회 1회를 로컬 버퍼에 쌓습니다. 중복 조회로 무시되면 False를 반환합니다."""
+        if fingerprint and self.dedupe_seconds > 0:
+            now = time.monotonic()
+            seen_key = f"{post_id}:{fingerprint}"
+            expires_at = self._seen.get(seen_key)
+            if expires_at is not None and expires_at > now:
+                return False
+            self._seen[seen_key] = now + self.dedupe_seconds
+            self._seen.move_to_end(seen_key)
+            while len(self._seen) > self.max_tracked:
+                self._seen.popitem(last=False)
+
+        self._pending[post_id] = self._pending.get(post_id, 0) + 1
+        self._db_views.setdefault(post_id, db_views)
+        return True
+
+    def known_views(self, post_id: int) -> Optional[int]:
+        """마지막으로 알려진 Redis 조회수 (모르면 None)"""
+        return self._known.get(post_id)
+
+    def pending_views(self, post_id: int) -> int:
+        """아직 Redis에 반영되지 않은 조회수"""
+        return self._pending.get(post_id, 0)
+
+    def remember(self, post_id: int, views: int):
+        self._known[post_id] = views
+        self._known.move_to_end(post_id)
+        while len(self._known) > self.max_tracked:
+            self._known.popitem(last=False)
+
+    def discard(self, post_id: int):
+        """삭제된 게시글의 버퍼를 비웁니다."""
+        self._pending.pop(post_id, None)
+        self._db_views.pop(post_id, None)
+        self._known.pop(post_id, None)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        db_views, self._db_views = self._db_views, {}
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for post_id, increment in pending.items():
+                    # 중복 조회는 로컬에서 이미 걸렀으므로 Redis 측 dedupe는 끔
+                    keys, args = _record_view_args(post_id, increment, db_views.get(post_id, 0), None, 0)
+                    await self._script(keys=keys, args=args, client=pipe)
+                results = await pipe.execute()
+        except Exception as e:
+            # 반영하지 못한 조회수는 다음 flush 때 다시 시도
+            logging.warning(f"조회수 일괄 반영 실패, 다음 주기에 재시도합니다: {e}")
+            for post_id, increment in pending.items():
+                self._pending[post_id] = self._pending.get(post_id, 0) + increment
+                self._db_views.setdefault(post_id, db_views.get(post_id, 0))
+            return
+        for post_id, views in zip(pending, results):
+            if views is not None:
+                self.remember(post_id, int(views))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+
+# --- 동기화 큐 claim/ack (여러 워커 레플리카가 안전하게 나눠 처리) ---
+# 워커가 가져간 게시글 ID는 워커별 처리 중 집합으로 옮겨지고, DB 커밋 후 ack 시 제거됩니다.
+VIEW_SYNC_PROCESSING_PREFIX = "view_sync_processing:"
+# 워커 ID -> 마지막 하트비트 시각 (오래된 워커의 처리 중 항목은 큐로 되돌림)
+VIEW_SYNC_WORKERS = "view_sync_workers"
+
+# KEYS[1]=큐, KEYS[2]=처리 중 집합, KEYS[3]=워커 목록 / ARGV[1]=개수, ARGV[2]=현재 시각, ARGV[3]=워커 ID
+CLAIM_LUA = """
+redis.call('ZADD', KEYS[3], ARGV[2], ARGV[3])
+local items = redis.call('ZRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items == 0 then
+  return items
+end
+redis.call('ZREM', KEYS[1], unpack(items))
+for _, id in ipairs(items) do
+  redis.call('ZADD', KEYS[2], ARGV[2], id)
+end
+return items
+"""
+
+# KEYS[1]=처리 중 집합, KEYS[2]=큐 / ARGV[1]=현재 시각
+# 이미 큐에 다시 들어온 항목은 그대로 두고(NX), 나머지를 큐로 되돌립니다.
+REQUEUE_LUA = """
+local items = redis.call('ZRANGE', KEYS[1], 0, -1)
+for _, id in ipairs(items) do
+  redis.call('ZADD', KEYS[2], 'NX', ARGV[1], id)
+end
+redis.call('DEL', KEYS[1])
+return #items
+"""
+
+
+def processing_key(worker_id: str) -> str:
+    return f"{VIEW_SYNC_PROCESSING_PREFIX}{worker_id}"
+
+
+async def claim_view_sync_batch(redis_client: redis.Redis, worker_id: str, count: int):
+    """큐 앞쪽의 게시글 ID를 최대 count개 원자적으로 가져와 이 워커의 처리 중 집합으로 옮깁니다."""
+    script = redis_client.register_script(CLAIM_LUA)
+    return await script(
+        keys=[VIEW_SYNC_QUEUE, processing_key(worker_id), VIEW_SYNC_WORKERS],
+        args=[count, time.time(), worker_id],
+    )
+
+
+async def ack_view_sync_batch(redis_client: redis.Redis, worker_id: str, post_ids):
+    """DB 커밋이 끝난 게시글 ID를 처리 중 집합에서 제거합니다."""
+    if post_ids:
+        await redis_client.zrem(processing_key(worker_id), *post_ids)
+
+
+async def requeue_claims(redis_client: redis.Redis, worker_id: str) -> int:
+    """해당 워커가 처리 중이던 항목을 모두 큐로 되돌립니다."""
+    script = redis_client.register_script(REQUEUE_LUA)
+    return await script(keys=[processing_key(worker_id), VIEW_SYNC_QUEUE], args=[time.time()])
+
+
+async def reclaim_stale_claims(redis_client: redis.Redis, stale_seconds: float) -> int:
+    """하트비트가 stale_seconds 이상 끊긴 워커의 처리 중 항목을 큐로 되돌립니다."""
+    stale_workers = await redis_client.zrangebyscore(VIEW_SYNC_WORKERS, "-inf", time.time() - stale_seconds)
+    reclaimed = 0
+    for worker_id in stale_workers:
+        reclaimed += await requeue_claims(redis_client, worker_id)
+        await redis_client.zrem(VIEW_SYNC_WORKERS, worker_id)
+    return reclaimed
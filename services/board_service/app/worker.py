@@ -1,15 +1,23 @@
 import asyncio
 import os
 import sys
+import time
+import socket
 import logging # logging 모듈 임포트
 from dotenv import load_dotenv
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy import update, case
 import redis.asyncio as redis
 
+from database import engine
 from models import Post
+from post_counter import reconcile_post_count
+from view_counter import (
+    get_view_counts, claim_view_sync_batch, ack_view_sync_batch,
+    requeue_claims, reclaim_stale_claims,
+)
 
 # --- 로깅 설정 ---
 # 로그 메시지를 터미널(stdout)에 즉시 출력하도록 설정합니다.
@@ -18,63 +26,117 @@ logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='--- [Worker]
 # 환경 변수 로드
 load_dotenv()
 
-# 데이터베이스 엔진과 Redis URL 설정
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_async_engine(DATABASE_URL)
+# Redis URL 설정 (DB 엔진/풀 설정은 API와 같은 database.py를 사용)
 REDIS_URL = os.getenv("REDIS_URL")
 
+# 한 번에 처리할 게시글 수와, 한 번의 실행에서 사용할 최대 시간(초)
+VIEW_SYNC_CHUNK_SIZE = int(os.getenv("VIEW_SYNC_CHUNK_SIZE", "500"))
+VIEW_SYNC_MAX_SECONDS = float(os.getenv("VIEW_SYNC_MAX_SECONDS", "50"))
+# 레플리카마다 고유해야 합니다. (기본값: 호스트명-PID)
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+# 이 시간(초) 이상 하트비트가 없는 워커가 가져간 항목은 다른 워커가 회수합니다.
+VIEW_SYNC_STALE_SECONDS = float(os.getenv("VIEW_SYNC_STALE_SECONDS", "300"))
+# 마지막 동기화 결과 (rows, seconds, rows_per_sec, finished_at)
+VIEW_SYNC_METRICS_KEY = "metrics:view_sync"
+
+async def bulk_update_views(view_counts):
+    """UPDATE post SET views = CASE id WHEN .. THEN .. END WHERE id IN (..) 한 문장으로 반영합니다."""
+    statement = (
+        update(Post)
+        .where(Post.id.in_(list(view_counts)))
+        .values(views=case(view_counts, value=Post.id))
+    )
+    async with engine.begin() as conn:
+        await conn.execute(statement)
+
 async def sync_redis_to_mysql():
     """
     1분마다 실행되며, Redis의 조회수를 MySQL에 동기화하는 메인 함수입니다.
     """
     logging.info("조회수 동기화 작업 시작")
-    
+    started = time.perf_counter()
+    synced_rows = 0
+
     redis_client = None
     try:
         redis_client = redis.from_url(REDIS_URL, decode_responses=True)
-        logging.info("Redis 클라이언트 생성 완료")
 
-        post_ids_to_sync = await redis_client.zrange("view_sync_queue", 0, -1)
-        if not post_ids_to_sync:
+        # 죽은 워커가 가져간 채로 남은 항목을 먼저 큐로 되돌립니다.
+        reclaimed = await reclaim_stale_claims(redis_client, VIEW_SYNC_STALE_SECONDS)
+        if reclaimed:
+            logging.info(f"응답 없는 워커의 처리 중 항목 {reclaimed}개를 큐로 되돌렸습니다.")
+
+        # 큐를 VIEW_SYNC_CHUNK_SIZE 단위로 claim 하여 처리합니다. (청크당 MGET 1회 + UPDATE 1회)
+        # claim 이후 들어온 조회는 큐에 다시 등록되므로 다음 실행에서 반영됩니다.
+        while time.perf_counter() - started < VIEW_SYNC_MAX_SECONDS:
+            post_ids_to_sync = await claim_view_sync_batch(redis_client, WORKER_ID, VIEW_SYNC_CHUNK_SIZE)
+            if not post_ids_to_sync:
+                break
+
+            view_counts = await get_view_counts(redis_client, [int(post_id) for post_id in post_ids_to_sync])
+            if view_counts:
+                await bulk_update_views(view_counts)
+                synced_rows += len(view_counts)
+
+            # DB 커밋이 끝난 뒤에만 ack (실패 시 처리 중 집합에 남아 나중에 회수됨)
+            await ack_view_sync_batch(redis_client, WORKER_ID, post_ids_to_sync)
+            if len(post_ids_to_sync) < VIEW_SYNC_CHUNK_SIZE:
+                break
+
+        elapsed = time.perf_counter() - started
+        rows_per_sec = synced_rows / elapsed if elapsed > 0 else 0.0
+        await redis_client.hset(VIEW_SYNC_METRICS_KEY, mapping={
+            "rows": synced_rows,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(rows_per_sec, 1),
+            "finished_at": int(time.time()),
+        })
+        if synced_rows:
+            logging.info(f"조회수 동기화 완료: {synced_rows}건, {elapsed:.2f}초 ({rows_per_sec:.1f} rows/s)")
+        else:
             logging.info("동기화할 게시물이 없습니다.")
-            return
-
-        logging.info(f"{len(post_ids_to_sync)}개의 동기화 대상 발견: {post_ids_to_sync}")
-        
-        updates_to_commit = []
-        for post_id_str in post_ids_to_sync:
-            post_id = int(post_id_str)
-            redis_key = f"views:post:{post_id}"
-            view_count_str = await redis_client.get(redis_key)
-            
-            if view_count_str:
-                updates_to_commit.append({"id": post_id, "views": int(view_count_str)})
-                logging.info(f"Post ID {post_id}의 조회수 {view_count_str}를 업데이트 목록에 추가")
-
-        if updates_to_commit:
-            async with AsyncSession(engine) as session:
-                logging.info("DB 세션 시작")
-                for update in updates_to_commit:
-                    db_post = await session.get(Post, update["id"])
-                    if db_post:
-                        db_post.views = update["views"]
-                
-                logging.info(f"{len(updates_to_commit)}개의 업데이트를 DB에 커밋합니다...")
-                await session.commit()
-                logging.info("DB 커밋 완료.")
-
-        await redis_client.zrem("view_sync_queue", *post_ids_to_sync)
-        logging.info(f"{len(post_ids_to_sync)}개 작업 큐에서 제거 완료")
 
     except Exception as e:
         logging.error(f"동기화 중 심각한 오류 발생: {e}", exc_info=True)
+        # ack하지 못한 항목은 다음 실행(또는 다른 워커)이 처리하도록 큐로 되돌립니다.
+        if redis_client:
+            try:
+                await requeue_claims(redis_client, WORKER_ID)
+            except Exception as requeue_error:
+                logging.error(f"처리 중 항목을 큐로 되돌리지 못했습니다: {requeue_error}")
+    finally:
+        if redis_client:
+            await redis_client.aclose()
+
+
+async def reconcile_post_counter():
+    """Redis의 전체 게시글 수 카운터를 DB의 COUNT(*) 값으로 보정합니다."""
+    redis_client = None
+    try:
+        redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+        async with AsyncSession(engine) as session:
+            total = await reconcile_post_count(redis_client, session)
+        logging.info(f"게시글 수 카운터 보정 완료: {total}")
+    except Exception as e:
+        logging.error(f"게시글 수 카운터 보정 중 오류 발생: {e}", exc_info=True)
     finally:
         if redis_client:
             await redis_client.aclose()
-            logging.info("Redis 연결 종료")
+
+
+async def recover_own_claims():
+    """같은 WORKER_ID로 재시작한 경우, 이전 실행에서 ack하지 못한 항목을 큐로 되돌립니다."""
+    redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+    try:
+        recovered = await requeue_claims(redis_client, WORKER_ID)
+        if recovered:
+            logging.info(f"이전 실행에서 처리하지 못한 항목 {recovered}개를 큐로 되돌렸습니다.")
+    finally:
+        await redis_client.aclose()
 
 
 async def main():
+    await recover_own_claims()
     scheduler = AsyncIOScheduler()
     scheduler.add_job(sync_redis_to_mysql, 
                       'interval', 
@@ -84,8 +146,14 @@ async def main():
                       #misfire_grace_time=None,  # 무제한 지연 허용
                       coalesce=True,            # 누락 병합
                       max_instances=1)           # 인스턴스 제한)
+    scheduler.add_job(reconcile_post_counter,
+                      'interval',
+                      minutes=5,
+                      id="post_count_job",
+                      coalesce=True,
+                      max_instances=1)
     scheduler.start()
-    logging.info("백그라운드 워커 시작. 1분마다 조회수를 동기화합니다. (Ctrl+C로 종료)")
+    logging.info(f"백그라운드 워커 시작 (ID: {WORKER_ID}). 1분마다 조회수를 동기화합니다. (Ctrl+C로 종료)")
     
     try:
         while True:
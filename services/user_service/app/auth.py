@@ -1,26 +1,114 @@
+import os
 import secrets
 from typing import Optional
-from passlib.context import CryptContext
 from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+from password_hasher import password_hasher
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SESSION_TTL_SECONDS = 3600
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+# 1이면 세션을 조회할 때마다 만료 시간을 SESSION_TTL_SECONDS로 다시 늘립니다. (같은 파이프라인으로 전송)
+SESSION_SLIDING_EXPIRY = os.getenv("SESSION_SLIDING_EXPIRY", "0") == "1"
+# 사용자 ID -> 그 사용자의 세션 ID 집합. 프로필이 바뀌면 모든 세션의 스냅샷을 갱신하는 데 씁니다.
+USER_SESSIONS_KEY_PREFIX = "user_sessions:"
+# "session:<id>" 해시에 보관하는 사용자 정보. /api/auth/me가 DB 없이 응답할 수 있는 최소 필드입니다.
+SESSION_SNAPSHOT_FIELDS = ("id", "username", "email", "bio", "profile_image_filename")
 
-def get_password_hash(password:str) -> str:
-    return pwd_context.hash(password)
+# 세션 해시를 만들고 사용자별 세션 집합에 등록하면서, 이미 만료된 세션 ID는 집합에서 뺍니다.
+# KEYS = [session 키, user_sessions 키], ARGV = [세션 ID, TTL, 필드1, 값1, ...]
+CREATE_SESSION_LUA = """
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+for _, sid in ipairs(redis.call('SMEMBERS', KEYS[2])) do
+  if redis.call('EXISTS', 'session:' .. sid) == 0 then
+    redis.call('SREM', KEYS[2], sid)
+  end
+end
+redis.call('SADD', KEYS[2], ARGV[1])
+return true
+"""
+
+# 살아 있는 세션의 스냅샷만 덮어쓰고(만료 시간은 유지), 없어진 세션은 집합에서 뺍니다.
+# KEYS = [user_sessions 키], ARGV = [필드1, 값1, ...]
+REFRESH_SESSIONS_LUA = """
+local refreshed = 0
+for _, sid in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+  local key = 'session:' .. sid
+  if redis.call('TYPE', key)['ok'] == 'hash' then
+    redis.call('HSET', key, unpack(ARGV))
+    refreshed = refreshed + 1
+  else
+    redis.call('SREM', KEYS[1], sid)
+  end
+end
+return refreshed
+"""
+# 게이트웨이 세션 캐시 무효화 채널 (gateway/app/session_cache.py와 동일해야 함)
+SESSION_INVALIDATION_CHANNEL = "auth:invalidate"
+
+# bcrypt는 이벤트 루프를 막지 않도록 password_hasher의 스레드 풀에서 실행합니다.
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash(password:str) -> str:
+    return await password_hasher.hash(password)
 
 async def delete_session(redis: Redis, session_id:str):
-    await redis.delete(f"session:{session_id}")
-    
-async def create_session(redis: Redis, user_id:int) -> str:
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.delete(f"session:{session_id}")
+        pipe.publish(SESSION_INVALIDATION_CHANNEL, f"session:{session_id}")
+        await pipe.execute()
+
+async def invalidate_user_sessions(redis: Redis, user_id:int):
+    """게이트웨이에 캐시된 해당 사용자의 모든 세션 검증 결과를 무효화합니다."""
+    await redis.publish(SESSION_INVALIDATION_CHANNEL, f"user:{user_id}")
+
+def session_snapshot(user) -> dict:
+    """세션 해시에 저장할 값. Redis 해시는 None을 저장할 수 없으므로 빈 문자열로 바꿉니다."""
+    return {field: "" if getattr(user, field) is None else getattr(user, field) for field in SESSION_SNAPSHOT_FIELDS}
+
+def flatten_mapping(mapping: dict) -> list:
+    return [item for pair in mapping.items() for item in pair]
+
+async def create_session(redis: Redis, user) -> str:
     session_id = secrets.token_hex(16)
-    await redis.setex(f"session:{session_id}", SESSION_TTL_SECONDS, user_id)
+    script = redis.register_script(CREATE_SESSION_LUA)
+    await script(
+        keys=[f"session:{session_id}", f"{USER_SESSIONS_KEY_PREFIX}{user.id}"],
+        args=[session_id, SESSION_TTL_SECONDS, *flatten_mapping(session_snapshot(user))],
+    )
     return session_id
 
-async def get_user_id_from_session(redis: Redis, session_id:str) -> Optional[int]:
-    user_id = await redis.get(f"session:{session_id}")
-    return user_id if user_id else None
+async def refresh_user_sessions(redis: Redis, user) -> int:
+    """프로필 변경 후 호출해 해당 사용자의 모든 세션 스냅샷을 갱신합니다. 반환값: 갱신된 세션 수"""
+    script = redis.register_script(REFRESH_SESSIONS_LUA)
+    return await script(
+        keys=[f"{USER_SESSIONS_KEY_PREFIX}{user.id}"],
+        args=flatten_mapping(session_snapshot(user)),
+    )
 
+async def get_session_snapshot(redis: Redis, session_id:str) -> Optional[dict]:
+    """
+    세션의 사용자 스냅샷을 반환합니다. 없거나 만료된 세션이면 None.
+    이전 형식(값이 user_id 문자열인 키)의 세션은 {"id": user_id}만 반환하므로
+    호출하는 쪽에서 "username" 유무로 DB 조회 여부를 판단합니다. (해당 세션은 TTL 이내에 사라짐)
+    """
+    key = f"session:{session_id}"
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hgetall(key)
+        if SESSION_SLIDING_EXPIRY:
+            pipe.expire(key, SESSION_TTL_SECONDS)
+        results = await pipe.execute(raise_on_error=False)
+    snapshot = results[0]
+    if isinstance(snapshot, ResponseError):
+        # WRONGTYPE: 이전 형식의 문자열 세션
+        user_id = await redis.get(key)
+        return {"id": user_id} if user_id else None
+    if isinstance(snapshot, Exception):
+        raise snapshot
+    if not snapshot or not snapshot.get("id"):
+        return None
+    return {field: value or None for field, value in snapshot.items()}
 
+async def get_user_id_from_session(redis: Redis, session_id:str) -> Optional[int]:
+    snapshot = await get_session_snapshot(redis, session_id)
+    return snapshot["id"] if snapshot else None
@@ -0,0 +1,13 @@
+from typing import Optional
+
+import redis.asyncio as redis
+
+# 게이트웨이 응답 캐시가 참조하는 버전 키 (gateway/app/response_cache.py와 같은 prefix)
+# 사용자명/프로필 이미지가 담긴 응답(사용자 조회, 블로그 글 목록)은 이 버전이 바뀌면 다시 만들어집니다.
+CACHE_VERSION_PREFIX = "cache:version:"
+
+
+async def bump_cache_version(redis_client: Optional[redis.Redis], name: str):
+    """프로필(사용자명, 프로필 이미지) 변경 후 호출합니다."""
+    if redis_client:
+        await redis_client.incr(f"{CACHE_VERSION_PREFIX}{name}")
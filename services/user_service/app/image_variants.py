@@ -0,0 +1,56 @@
+import os
+import json
+from typing import Iterable, Optional
+
+import redis.asyncio as redis
+
+# 업로드 직후 넣는 리사이즈 작업 큐. blog_service의 image_worker.py가 처리합니다.
+IMAGE_VARIANT_QUEUE = "images:variants"
+# 만들어 둘 가로 크기(px)와 형식. 파일명은 "<원본 이름>_w<폭>.<확장자>" 로 정해져 있어 존재 여부로 완료를 판단합니다.
+IMAGE_VARIANT_WIDTHS = tuple(int(w) for w in os.getenv("IMAGE_VARIANT_WIDTHS", "160,320,640").split(","))
+IMAGE_VARIANT_FORMATS = ("webp", "jpeg")
+VARIANT_DIRNAME = "variants"
+IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp"})
+
+FORMAT_EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+
+def is_image_filename(filename: Optional[str]) -> bool:
+    return bool(filename) and os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS
+
+
+def variant_filename(filename: str, width: int, fmt: str = "webp") -> str:
+    stem = os.path.splitext(filename)[0]
+    return f"{stem}_w{width}.{FORMAT_EXTENSIONS[fmt]}"
+
+
+def variant_path(directory: str, filename: str, width: int, fmt: str = "webp") -> str:
+    return os.path.join(directory, VARIANT_DIRNAME, variant_filename(filename, width, fmt))
+
+
+def image_url(url_prefix: str, directory: str, filename: str, width: int, fmt: str = "webp") -> str:
+    """리사이즈된 파일이 준비되어 있으면 그 URL을, 아직이면 원본 URL을 반환합니다."""
+    if is_image_filename(filename) and os.path.exists(variant_path(directory, filename, width, fmt)):
+        return f"{url_prefix}/{VARIANT_DIRNAME}/{variant_filename(filename, width, fmt)}"
+    return f"{url_prefix}/{filename}"
+
+
+async def enqueue_variants(redis_client: Optional[redis.Redis], kind: str, filenames: Iterable[str]):
+    """
+    원본 이미지의 리사이즈 작업을 큐에 넣습니다.
+    kind는 워커가 저장 위치를 찾는 데 쓰는 이름입니다. ("images" = 블로그 이미지, "profiles" = 프로필 이미지)
+    """
+    jobs = [json.dumps({"kind": kind, "filename": filename}) for filename in filenames if is_image_filename(filename)]
+    if redis_client and jobs:
+        await redis_client.lpush(IMAGE_VARIANT_QUEUE, *jobs)
+
+
+def remove_variants(directory: str, filenames: Iterable[str]):
+    """원본을 지운 뒤 남은 리사이즈 파일도 지웁니다."""
+    for filename in filenames:
+        for width in IMAGE_VARIANT_WIDTHS:
+            for fmt in IMAGE_VARIANT_FORMATS:
+                try:
+                    os.remove(variant_path(directory, filename, width, fmt))
+                except FileNotFoundError:
+                    pass
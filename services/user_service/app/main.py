@@ -1,28 +1,49 @@
 import os
-import uuid
-from typing import Annotated, Optional
-from fastapi import FastAPI, status, Response, Depends, HTTPException, Cookie, UploadFile, File, Header
+from typing import Annotated, List, Optional
+from fastapi import FastAPI, status, Response, Depends, HTTPException, Cookie, UploadFile, File, Header, Query
 from fastapi.staticfiles import StaticFiles
-from sqlmodel import select
+from sqlmodel import select, func
 from sqlmodel.ext.asyncio.session import AsyncSession
 from redis.asyncio import Redis
 
 from models import User, UserCreate, UserPublic, Userlogin, UserUpdate, UpdatePassword
-from database import init_db, get_session
+from database import init_db, get_session, get_read_session, pool_metrics
 from redis_client import get_redis
-from auth import get_password_hash, create_session, verify_password, get_user_id_from_session, delete_session
+from password_hasher import password_hasher
+from user_cache import publish_user_updated
+from cache_version import bump_cache_version
+from image_variants import enqueue_variants, image_url, remove_variants
+from uploads import save_upload, discard_uploads, finalize_uploads, remove_unreferenced
+from auth import (
+    get_password_hash, create_session, verify_password, get_user_id_from_session, get_session_snapshot,
+    delete_session, invalidate_user_sessions, refresh_user_sessions, SESSION_TTL_SECONDS, SESSION_SLIDING_EXPIRY,
+)
 app = FastAPI(title="User Service")
 
+# 사용자 공개 정보에 의존하는 게이트웨이 응답 캐시 버전 (프로필 변경 시 증가)
+USERS_CACHE_VERSION = "users"
+
+# 일괄 조회 한 번에 허용하는 최대 ID 수
+MAX_BATCH_USER_IDS = 100
+
 STATIC_DIR = "/app/static"
 PROFILE_IMAGE_DIR = f"{STATIC_DIR}/profiles"
 os.makedirs(PROFILE_IMAGE_DIR, exist_ok =True)
+MAX_PROFILE_IMAGE_BYTES = int(os.getenv("MAX_PROFILE_IMAGE_BYTES", str(5 * 1024 * 1024)))
+# 프로필 이미지로 내려주는 리사이즈 폭(px)
+AVATAR_WIDTH = int(os.getenv("AVATAR_WIDTH", "160"))
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
+def profile_image_url(filename: Optional[str]) -> str:
+    # 리사이즈된 아바타가 준비되어 있으면 그것을, 아니면 원본을 사용
+    if filename:
+        return image_url("/static/profiles", PROFILE_IMAGE_DIR, filename, AVATAR_WIDTH)
+    return "https://www.w3schools.com/w3images/avatar_g.jpg"
+
 def create_user_public(user: User) -> UserPublic:
     
-    image_url = f"/static/profiles/{user.profile_image_filename}" if user.profile_image_filename else "https://www.w3schools.com/w3images/avatar_g.jpg"
     user_dict = user.model_dump()
-    user_dict["profile_image_url"] = image_url
+    user_dict["profile_image_url"] = profile_image_url(user.profile_image_filename)
     return UserPublic.model_validate(user_dict)
     '''
     if user.profile_image_filename:
@@ -31,6 +52,24 @@ def create_user_public(user: User) -> UserPublic:
         image_url = "https://www.w3schools.com/w3images/avatar_g.jpg"
     '''
 
+def user_public_from_snapshot(snapshot: dict) -> UserPublic:
+    """Redis 세션 스냅샷으로 만든 UserPublic (DB 조회 없음)"""
+    return UserPublic(
+        id=int(snapshot["id"]),
+        username=snapshot["username"],
+        email=snapshot.get("email") or "",
+        bio=snapshot.get("bio"),
+        profile_image_url=profile_image_url(snapshot.get("profile_image_filename")),
+    )
+
+async def count_profile_image_references(session: AsyncSession, filename: str) -> int:
+    """같은 프로필 이미지 파일을 쓰는 사용자 수"""
+    result = await session.exec(select(func.count(User.id)).where(User.profile_image_filename == filename))
+    count = result.one()
+    # 다음 호출이 최신 커밋을 보도록 읽기 트랜잭션을 끝냅니다. (REPEATABLE READ 스냅샷 재사용 방지)
+    await session.rollback()
+    return count
+
 async def get_current_user_id(
     session_id: Annotated[str | None, Cookie()] = None,
     redis: Annotated[Redis, Depends(get_redis)] = None,
@@ -46,10 +85,19 @@ async def get_current_user_id(
 async def on_startup():
     await init_db()
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    password_hasher.shutdown()
+
 @app.get("/")
 def health_check():
     return {"status":"User service running"}
 
+# 내부 지표 (게이트웨이를 거치지 않는 내부용)
+@app.get("/metrics")
+async def get_metrics():
+    return {"password_hashing": password_hasher.stats(), "db_pool": pool_metrics()}
+
 @app.post('/api/auth/register', response_model=UserPublic, status_code=status.HTTP_201_CREATED)
 async def register_user(
     response: Response,
@@ -65,7 +113,7 @@ async def register_user(
     if exist_user_result.one_or_none():
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="이미 사용중인 이메일 입니다.")
     
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash(user_data.password)
     new_user = User.model_validate(user_data, update={"hashed_password": hashed_password})
     
     session.add(new_user)
@@ -73,7 +121,7 @@ async def register_user(
     await session.refresh(new_user)
     if not new_user.id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="데이터 저장에 실패 했습니다.")
-    session_id = await create_session(redis, new_user.id)
+    session_id = await create_session(redis, new_user)
     response.set_cookie(key="session_id", value=session_id, httponly=True, samesite="lax", max_age=3600, path="/")
 
     return create_user_public(new_user)
@@ -92,10 +140,10 @@ async def login(
     
     user = user_result.one_or_none()
     
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    if not user or not await verify_password(user_data.password, user.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="이메일 또는 비밀번호가 틀립니다.")
     if user.id is not None:
-        session_id = await create_session(redis, user.id)
+        session_id = await create_session(redis, user)
     else:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="세션 번호가 저장되지 않았습니다.")
     response.set_cookie(key="session_id", value=session_id, httponly=True, samesite="lax", max_age=3600, path="/")
@@ -113,13 +161,21 @@ async def get_current_user(
     if not session_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     
-    user_id = await get_user_id_from_session(redis, session_id)
+    snapshot = await get_session_snapshot(redis, session_id)
     
-    if not user_id:
+    if not snapshot:
         response.delete_cookie("session_id", path="/")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found redis session")
     
-    user = await session.get(User, int(user_id))
+    if SESSION_SLIDING_EXPIRY:
+        # Redis 쪽 만료가 연장되었으므로 브라우저 쿠키 만료도 함께 늘립니다.
+        response.set_cookie(key="session_id", value=session_id, httponly=True, samesite="lax", max_age=SESSION_TTL_SECONDS, path="/")
+    # 세션에 사용자 스냅샷이 있으면 MySQL을 거치지 않고 응답
+    if snapshot.get("username"):
+        return user_public_from_snapshot(snapshot)
+    
+    # 이전 형식의 세션: DB에서 조회
+    user = await session.get(User, int(snapshot["id"]))
     
     if not user:
         response.delete_cookie("session_id", path="/")
@@ -138,10 +194,28 @@ async def logout(
     response.delete_cookie("session_id", path="/")
     return {"message": "Logout 성공"}
 
+@app.get("/api/users", response_model=List[UserPublic])
+async def get_users_by_ids(
+    session: Annotated[AsyncSession, Depends(get_read_session)],
+    ids: str = Query(..., description="콤마로 구분한 사용자 ID 목록 (예: 1,2,3)"),
+):
+    """여러 사용자의 공개 정보를 IN 쿼리 한 번으로 조회합니다. 없는 ID는 결과에서 빠집니다."""
+    try:
+        user_ids = {int(user_id) for user_id in ids.split(",") if user_id.strip()}
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids는 숫자 목록이어야 합니다.")
+    if len(user_ids) > MAX_BATCH_USER_IDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"ids는 최대 {MAX_BATCH_USER_IDS}개까지 조회할 수 있습니다.")
+    if not user_ids:
+        return []
+
+    result = await session.exec(select(User).where(User.id.in_(user_ids)))
+    return [create_user_public(user) for user in result.all()]
+
 @app.get("/api/users/{user_id}", response_model=UserPublic)
 async def get_user_by_id(
     user_id: int,
-    session: Annotated[AsyncSession, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(get_read_session)]
 ):
     user = await session.get(User, user_id)
     if not user:
@@ -153,6 +227,7 @@ async def get_user_by_id(
 async def update_my_profile(
     user_data: UserUpdate,
     session: Annotated[AsyncSession, Depends(get_session)],
+    redis: Annotated[Redis, Depends(get_redis)],
     user_id: Annotated[int, Depends(get_current_user_id)],
 ):
     """로그인된 사용자의 프로필(이메일, 자기소개) 수정"""
@@ -167,12 +242,16 @@ async def update_my_profile(
     
     await session.commit()
     await session.refresh(db_user)
+    await refresh_user_sessions(redis, db_user)
+    await publish_user_updated(redis, user_id)
+    await bump_cache_version(redis, USERS_CACHE_VERSION)
     return create_user_public(db_user)
     
     
 @app.post("/api/users/me/upload-image", response_model=UserPublic)
 async def upload_my_profile_image(
     session: Annotated[AsyncSession, Depends(get_session)],
+    redis: Annotated[Redis, Depends(get_redis)],
     user_id : Annotated[int, Depends(get_current_user_id)],
     file: UploadFile
 ):
@@ -180,16 +259,26 @@ async def upload_my_profile_image(
     if not db_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="사용자가 없습니다.")
     
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filenam = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(PROFILE_IMAGE_DIR, unique_filenam)
-    
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
-        
-    db_user.profile_image_filename = unique_filenam
-    await session.commit()
+    # 청크 단위로 임시 파일에 쓴 뒤, 커밋 후 "<sha256><확장자>" 이름으로 옮김 (크기 제한 초과 시 413)
+    upload = await save_upload(file, PROFILE_IMAGE_DIR, MAX_PROFILE_IMAGE_BYTES)
+
+    previous_filename = db_user.profile_image_filename
+    db_user.profile_image_filename = upload.filename
+    try:
+        await session.commit()
+    except BaseException:
+        await discard_uploads([upload])
+        raise
+    await finalize_uploads([upload])
+    await enqueue_variants(redis, "profiles", [upload.filename])
+    # 이전 이미지는 다른 사용자가 같은 파일을 쓰지 않을 때만 삭제
+    if previous_filename and previous_filename != upload.filename:
+        removed_files = await remove_unreferenced(PROFILE_IMAGE_DIR, [previous_filename], lambda name: count_profile_image_references(session, name))
+        remove_variants(PROFILE_IMAGE_DIR, removed_files)
     await session.refresh(db_user)
+    await refresh_user_sessions(redis, db_user)
+    await publish_user_updated(redis, user_id)
+    await bump_cache_version(redis, USERS_CACHE_VERSION)
     return create_user_public(db_user)
     
 @app.post("/api/auth/change-password", status_code=status.HTTP_204_NO_CONTENT)
@@ -204,13 +293,14 @@ async def change_password(
     if not db_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="사용자가 없습니다.")
     
-    if not verify_password(password_data.current_password, db_user.hashed_password):
+    if not await verify_password(password_data.current_password, db_user.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="비밀번호가 다릅니다.")
     
-    db_user.hashed_password = get_password_hash(password_data.new_password)
+    db_user.hashed_password = await get_password_hash(password_data.new_password)
     await session.commit()
 
     if session_id:
         await delete_session(redis, session_id)
+    await invalidate_user_sessions(redis, user_id)
         
     return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
@@ -7,7 +7,7 @@ class User(SQLModel, table=True):
     email: str = Field(unique=True,index=True)
     hashed_password : str
     bio: Optional[str] = None
-    profile_image_filename: Optional[str] = None
+    profile_image_filename: Optional[str] = Field(default=None, index=True)  # "<sha256><확장자>"
 
 class UserCreate(SQLModel):
     username: str
@@ -0,0 +1,13 @@
+from redis.asyncio import Redis
+
+# 다른 서비스(blog)가 Redis에 보관하는 사용자 공개 정보 캐시 키와 변경 알림 채널
+USER_CACHE_KEY_PREFIX = "user:public:"
+USER_UPDATED_CHANNEL = "user:updated"
+
+
+async def publish_user_updated(redis: Redis, user_id: int):
+    """사용자 정보가 바뀌면 공유 캐시를 지우고, 프로세스 내 캐시도 비우도록 알립니다."""
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.delete(f"{USER_CACHE_KEY_PREFIX}{user_id}")
+        pipe.publish(USER_UPDATED_CHANNEL, str(user_id))
+        await pipe.execute()